@@ -1,12 +1,23 @@
-import tkinter as tk
-from tkinter import messagebox, ttk
-from datetime import datetime
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import json
+import time
+
+STARTED = time.perf_counter()  # taken before the other imports, which are part of startup too
+
+import argparse
 import os
+import queue
+import threading
+import tkinter as tk
+from tkinter import filedialog, messagebox, simpledialog, ttk
+
+import expense_anomaly
+import expense_budgets
+import expense_core as core
+import expense_import
+import expense_reports
+import expense_stats as stats
+import expense_sync
+import expense_trend
+import expense_wallets
 
 # Modern color palette - ELEGANT THEME
 COLORS = {
@@ -33,28 +44,50 @@ FONTS = {
     "small": ("Helvetica", 9)
 }
 
-# ---------------- FILE STORAGE ---------------- #
-DATA_FILE = "expense_data.json"
-
-def load_data():
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, "r") as f:
-                return json.load(f)
-        except:
-            pass
-    return {
-        "monthly_limit": 0,
-        "daily_limit": 0,
-        "expenses": [],
-        "streak": 0
-    }
-
-def save_data():
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f)
-
-data = load_data()
+parser = argparse.ArgumentParser(description="Smart Expense Tracker")
+parser.add_argument("file", nargs="?", default=core.DATA_FILE, help="ledger data file (.db for SQLite)")
+parser.add_argument("--wallets", metavar="DIR", help="switch between the wallets kept in DIR")
+parser.add_argument("--stats", action="store_true", help="show live call timings")
+parser.add_argument("--sync", metavar="URL", help="share the ledger with other desks through a sync server")
+options = None  # parsed by main()
+
+# ---------------- INSTRUMENTATION ---------------- #
+# --stats (or EXPENSE_STATS=1) times the engine and GUI hot paths and shows a live stats panel
+STATS = False
+
+# ---------------- LEDGER ---------------- #
+# Pass a .db path to use the SQLite backend instead of expense_data.bin
+# Disk writes happen on a write-behind thread so a slow disk never stalls the UI
+wallets = None
+wallet_name = None
+
+# ---------------- STARTUP ---------------- #
+# The ledger is read on a worker thread while the main window is built, and bound to
+# the views once both are ready; secondary windows are only built when opened
+INTERACTIVE_TARGET = 1.0  # seconds from launch to a usable window; expense_bench tracks it
+STARTUP_POLL_MS = 15
+
+ledger = None
+sync_client = None
+restore_error = None
+restored = threading.Event()
+startup_times = {}
+
+def restore_state():
+    global ledger, sync_client, restore_error
+    try:
+        if wallets is not None:
+            ledger = wallets.open(wallet_name)
+        else:
+            ledger = core.open_ledger(options.file, background=True)
+            if options.sync:
+                sync_client = expense_sync.SyncClient(ledger, options.sync).attach()
+            else:
+                expense_sync.attach(ledger)
+    except Exception as e:
+        restore_error = e
+    finally:
+        restored.set()
 
 # -------- CUSTOM STYLED BUTTON CLASS -------- #
 class ModernButton(tk.Button):
@@ -132,260 +165,790 @@ class ModernLabel(tk.Label):
         
         super().__init__(parent, text=text, font=font_name, **kwargs)
 
+# -------- VIRTUAL HISTORY CLASS -------- #
+class VirtualHistory:
+    """Show a scrolling window over the expense store using a small, reused pool of Treeview rows"""
+    def __init__(self, tree, scrollbar, store):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.store = store
+        self.visible = int(tree.cget("height"))
+        self.first = 0
+        self.following = True
+        self.items = []
+
+        scrollbar.config(command=self.yview)
+        tree.bind("<Configure>", self.on_resize)
+        tree.bind("<MouseWheel>", self.on_wheel)
+        tree.bind("<Button-4>", lambda event: self.scroll(-3) or "break")
+        tree.bind("<Button-5>", lambda event: self.scroll(3) or "break")
+
+    def refresh(self, follow=None):
+        """Redraw the window; by default it keeps following the tail if it was already there"""
+        total = len(self.store)
+        if follow is None:
+            follow = self.following
+        if follow:
+            self.first = total - self.visible
+        self.first = max(0, min(self.first, total - self.visible))
+        count = min(self.visible, total - self.first)
+
+        # Only the rows on screen exist as Tk items, however long the history is
+        while len(self.items) < count:
+            self.items.append(self.tree.insert("", "end"))
+        if len(self.items) > count:
+            self.tree.delete(*self.items[count:])
+            del self.items[count:]
+
+        for offset, item in enumerate(self.items):
+            day, category, amount = self.store.row(self.first + offset)
+            self.tree.item(item, values=(day, category, f"₹{amount}"))
+
+        if total:
+            self.scrollbar.set(self.first / total, (self.first + count) / total)
+        else:
+            self.scrollbar.set(0, 1)
+        self.following = self.first + self.visible >= total
+
+    def scroll(self, rows):
+        self.first += rows
+        self.refresh()
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.first = int(float(args[1]) * len(self.store))
+            self.refresh()
+        elif args[0] == "scroll":
+            rows = int(args[1])
+            if args[2] == "pages":
+                rows *= self.visible
+            self.scroll(rows)
+
+    def on_wheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def on_resize(self, event):
+        bbox = self.tree.bbox(self.items[0]) if self.items else ""
+        if not bbox:
+            return
+        _, top, _, row_height = bbox
+        visible = max(1, (event.height - top) // row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.refresh()
+
+
+# -------- FILTERED VIEW CLASS -------- #
+class FilteredView:
+    """The ledger's expenses that match the history filters, with the totals the charts read"""
+    def __init__(self, ledger, filters):
+        self.ledger = ledger
+        self.filters = filters
+        self.ledger_version = ledger.version
+        self.replaced = ledger.replaced
+        self.seen = len(ledger.store)
+        self.store = ledger.query(**filters)
+        self.total = round(sum(self.store.amounts), 2)
+        # Distinct from the ledger's own versions, so the charts redraw when a filter is applied
+        self.version = (ledger.version, tuple((key, str(value)) for key, value in filters.items()))
+
+    def current(self, ledger):
+        return ledger is self.ledger and ledger.version == self.ledger_version
+
+    def catch_up(self, ledger):
+        """Append the matches among the rows added since, like the unfiltered history does.
+        False when the ledger's rows were replaced instead and the query has to run again"""
+        if ledger is not self.ledger or ledger.replaced != self.replaced or len(ledger.store) < self.seen:
+            return False
+        added = ledger.query_added(self.seen, **self.filters)
+        self.store.extend(added.records())
+        self.total = round(self.total + sum(added.amounts), 2)
+        self.seen = len(ledger.store)
+        self.ledger_version = ledger.version
+        self.version = (ledger.version, self.version[1])
+        return True
+
+    def category_totals(self):
+        return self.store.category_sums()
+
+    def date_totals(self):
+        return self.store.date_sums()
+
+# -------- REFRESH SCHEDULER CLASS -------- #
+class RefreshScheduler:
+    """Coalesce refresh requests so each dirty view is redrawn at most once per frame"""
+    FRAME_MS = 16
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.views = {}
+        self.dirty = set()
+        self.pending = None
+
+    def register(self, name, callback):
+        self.views[name] = callback
+
+    def request(self, *names):
+        self.dirty.update(names)
+        if self.pending is None:
+            self.pending = self.widget.after(self.FRAME_MS, self.run)
+
+    def run(self):
+        self.pending = None
+        stats.count("refresh frames")
+        dirty, self.dirty = self.dirty, set()
+        # Views run in registration order, e.g. history before the status cards
+        for name, callback in self.views.items():
+            if name in dirty:
+                callback()
+
+widget_state = {}
+
+def configure_if_changed(widget, **options):
+    """Reconfigure a widget only for options whose value actually changed"""
+    changed = {key: value for key, value in options.items()
+               if widget_state.get((widget, key)) != value}
+    if changed:
+        widget.config(**changed)
+        for key, value in changed.items():
+            widget_state[(widget, key)] = value
+
+# -------- ANALYTICS WINDOW CLASS -------- #
+class AnalyticsWindow:
+    """Persistent charts window; artists are updated in place only when its source has changed"""
+    TREND_TITLES = {
+        "day": "Daily Spending Trend",
+        "week": "Weekly Spending Trend",
+        "month": "Monthly Spending Trend"
+    }
 
+    def __init__(self, parent, source):
+        # matplotlib is only paid for once the analytics window is actually opened
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+        from matplotlib import dates as mdates
+
+        self.mdates = mdates
+        self.source = source  # the ledger, or a FilteredView of it
+        self.rendered_version = None
+        self.bars = None
+        self.fill = None
+        self.trend_range = None
+        self.rescaling = False
+
+        # Modern color palette for charts
+        self.chart_colors = [COLORS["accent"], COLORS["success"], COLORS["warning"],
+                             COLORS["danger"], COLORS["soft_purple"]]
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Expense Analytics")
+        self.window.geometry("1000x600")
+        self.window.config(bg=COLORS["secondary"])
+        # Closing only hides the window so the figure is reused next time
+        self.window.protocol("WM_DELETE_WINDOW", self.window.withdraw)
+
+        self.fig = Figure(figsize=(12, 5.5), dpi=100, facecolor=COLORS["secondary"], edgecolor='none')
+        self.ax1 = self.fig.add_subplot(131)
+
+        self.ax2 = self.fig.add_subplot(132)
+        self.ax2.set_title("Category Spending", fontsize=12, weight="bold", color=COLORS["text"])
+        self.ax2.tick_params(axis='x', rotation=45, labelsize=9)
+        self.ax2.set_ylabel("Amount (₹)", fontsize=10, weight="bold")
+        self.ax2.grid(axis='y', alpha=0.3, linestyle='--')
+
+        self.ax3 = self.fig.add_subplot(133)
+        self.line, = self.ax3.plot([], [], marker='o', linewidth=2.5, markersize=8,
+                                   color=COLORS["accent"], markerfacecolor=COLORS["success"],
+                                   markeredgewidth=2, markeredgecolor=COLORS["accent"])
+        self.ax3.tick_params(axis='x', rotation=45, labelsize=9)
+        self.ax3.set_ylabel("Amount (₹)", fontsize=10, weight="bold")
+        self.ax3.grid(alpha=0.3, linestyle='--')
+        locator = mdates.AutoDateLocator()
+        self.ax3.xaxis.set_major_locator(locator)
+        self.ax3.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        # Zooming or panning the trend re-buckets it for the visible range
+        self.ax3.callbacks.connect("xlim_changed", self.on_trend_zoom)
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.window)
+        NavigationToolbar2Tk(self.canvas, self.window).pack(side="bottom", fill="x")
+        self.canvas.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=10)
+
+    def show(self):
+        self.window.deiconify()
+        self.window.lift()
+        self.render()
+
+    def render(self):
+        if self.rendered_version == self.source.version or self.window.state() == "withdrawn":
+            return
+        self.rendered_version = self.source.version
+
+        category_totals = self.source.category_totals()
+        categories = list(category_totals.keys())
+        amounts = list(category_totals.values())
+        positions = list(range(len(categories)))
+
+        # Wedge count and angles change together, so the pie is the one chart rebuilt
+        self.ax1.clear()
+        if amounts:
+            wedges, texts, autotexts = self.ax1.pie(amounts, labels=categories, autopct='%1.1f%%',
+                                                    colors=self.chart_colors, startangle=90,
+                                                    textprops={"fontsize": 10, "weight": "bold"})
+            for autotext in autotexts:
+                autotext.set_color("white")
+        self.ax1.set_title("Category Distribution", fontsize=12, weight="bold", color=COLORS["text"])
+
+        # Bars are resized in place unless a category was added or removed
+        if self.bars is not None and len(self.bars) == len(amounts):
+            for bar, amount in zip(self.bars, amounts):
+                bar.set_height(amount)
+        else:
+            if self.bars is not None:
+                self.bars.remove()
+            self.bars = self.ax2.bar(positions, amounts, color=self.chart_colors,
+                                     edgecolor=COLORS["text"], linewidth=1.5)
+        self.ax2.set_xticks(positions)
+        self.ax2.set_xticklabels(categories)
+        self.ax2.relim()
+        self.ax2.autoscale_view()
+
+        # New data resets any zoom; the rescale itself must not trigger a second re-bucket
+        self.trend_range = None
+        self.rescaling = True
+        self.update_trend()
+        self.ax3.autoscale(True)
+        self.ax3.relim()
+        self.ax3.autoscale_view()
+        self.rescaling = False
+
+        self.fig.tight_layout()
+        self.canvas.draw_idle()
+
+    def update_trend(self, start=None, end=None):
+        bucket, days, totals = expense_trend.trend_series(self.source.date_totals(), start, end)
+        x = self.mdates.date2num(days) if days else []
+
+        self.line.set_data(x, totals)
+        # Markers only help while individual points are still distinguishable
+        self.line.set_marker('o' if len(days) <= 60 else '')
+        if self.fill is not None:
+            self.fill.remove()
+        self.fill = self.ax3.fill_between(x, totals, alpha=0.2, color=COLORS["accent"])
+        self.ax3.set_title(self.TREND_TITLES[bucket], fontsize=12, weight="bold", color=COLORS["text"])
+
+    def on_trend_zoom(self, ax):
+        if self.rescaling:
+            return
+        start, end = (self.mdates.num2date(x).date() for x in ax.get_xlim())
+        if self.trend_range == (start, end):
+            return
+        self.trend_range = (start, end)
+        self.update_trend(start, end)
+        self.canvas.draw_idle()
 
 # -------- FUNCTIONS -------- #
 
 def set_limits():
     try:
-        data["monthly_limit"] = float(monthly_entry.get())
-        data["daily_limit"] = float(daily_entry.get())
-        save_data()
+        ledger.set_limits(float(monthly_entry.get()), float(daily_entry.get()))
         limit_window.destroy()
-        update_status()
+        refresh.request("status")
         messagebox.showinfo("Success 🎉", "Limits Set Successfully!")
     except:
         messagebox.showerror("Error ❌", "Enter valid numbers")
 
 def add_expense():
+    global latest_anomaly
     try:
         amount = float(amount_entry.get())
         if amount <= 0:
             messagebox.showwarning("Invalid Amount", "Amount must be positive!")
             return
 
-        category = category_var.get()
-        today = datetime.now().strftime("%Y-%m-%d")
-
-        data["expenses"].append({
-            "amount": amount,
-            "category": category,
-            "date": today
-        })
-
-        expense_list.insert("", "end", values=(today, category, f"₹{amount}"))
+        latest_anomaly = None
+        ledger.add_expense(amount, category_var.get())
         amount_entry.delete(0, tk.END)
 
-        save_data()
-        update_status()
+        refresh.request("history", "status")
 
     except:
         messagebox.showerror("Error ❌", "Enter valid amount")
 
-def get_total():
-    return sum(exp["amount"] for exp in data["expenses"])
-
-def get_today_total():
-    today = datetime.now().strftime("%Y-%m-%d")
-    return sum(exp["amount"] for exp in data["expenses"] if exp["date"] == today)
-
 def update_status():
-    total = get_total()
-    today_total = get_today_total()
+    global latest_anomaly
+    total = ledger.get_total()
+    today_total = ledger.get_today_total()
 
-    remaining = max(0, data["monthly_limit"] - total)
+    remaining = max(0, ledger.data["monthly_limit"] - total)
 
-    total_label.config(text=f"Monthly Spent: ₹{total}")
-    daily_label.config(text=f"Today Spent: ₹{today_total}")
+    configure_if_changed(total_label, text=f"Monthly Spent: ₹{total}")
+    configure_if_changed(daily_label, text=f"Today Spent: ₹{today_total}")
 
-    if total > data["monthly_limit"]:
-        remaining_label.config(text="Remaining: ₹0 (Limit Exceeded)")
+    if total > ledger.data["monthly_limit"]:
+        configure_if_changed(remaining_label, text="Remaining: ₹0 (Limit Exceeded)")
     else:
-        remaining_label.config(text=f"Remaining: ₹{remaining}")
+        configure_if_changed(remaining_label, text=f"Remaining: ₹{remaining}")
 
-    if data["monthly_limit"] > 0:
-        percent = (total / data["monthly_limit"]) * 100
-        progress['value'] = min(percent, 100)
+    if ledger.data["monthly_limit"] > 0:
+        percent = (total / ledger.data["monthly_limit"]) * 100
+        bar_value = min(percent, 100)
 
         if percent >= 100:
-            status_label.config(text="🚨 Monthly Limit Exceeded!", fg="red")
+            configure_if_changed(status_label, text="🚨 Monthly Limit Exceeded!", fg="red")
         elif percent >= 80:
-            status_label.config(text="⚠️ 80% Budget Used!", fg="orange")
+            configure_if_changed(status_label, text="⚠️ 80% Budget Used!", fg="orange")
         else:
-            status_label.config(text="✅ Within Budget", fg="green")
+            configure_if_changed(status_label, text="✅ Within Budget", fg="green")
     else:
-        progress['value'] = 0
-        status_label.config(text="Set Monthly Limit", fg="black")
+        bar_value = 0
+        configure_if_changed(status_label, text="Set Monthly Limit", fg="black")
 
+    # While an import runs the bar shows its progress instead of budget usage
+    if import_fraction is not None:
+        bar_value = import_fraction * 100
+    configure_if_changed(progress, value=bar_value)
+
+    anomalies = ledger.pop_anomalies()
+    if anomalies:
+        latest_anomaly = anomalies[-1]
     smart_advice()
     update_streak()
 
+    # Alerts raised during an import are held back and shown together once it finishes
+    if import_fraction is None:
+        show_budget_alerts()
+    if budget_window is not None and budget_window.winfo_exists():
+        update_budget_list()
+
+    if analytics is not None:
+        analytics.render()
+
 def smart_advice():
-    category_totals = {}
-    for exp in data["expenses"]:
-        category_totals[exp["category"]] = category_totals.get(exp["category"], 0) + exp["amount"]
+    # An unusual expense or spike from the last addition outranks the general tip
+    if latest_anomaly is not None:
+        configure_if_changed(advice_label, text=expense_anomaly.format_anomaly(latest_anomaly), fg=COLORS["danger"])
+        return
+
+    highest = ledger.top_category()
 
-    if category_totals:
-        highest = max(category_totals, key=category_totals.get)
-        advice_label.config(
+    if highest:
+        configure_if_changed(
+            advice_label,
             text=f"💡 Tip: You spend most on {highest}. Try reducing it!",
             fg="#4b0082"
         )
     else:
-        advice_label.config(text="")
+        configure_if_changed(advice_label, text="")
 
 def update_streak():
-    if data["daily_limit"] > 0 and get_today_total() <= data["daily_limit"]:
-        data["streak"] += 1
-    else:
-        data["streak"] = 0
+    streaks = ledger.streaks()
 
-    streak_label.config(
-        text=f"🔥 Smart Saving Streak: {data['streak']} days",
+    configure_if_changed(
+        streak_label,
+        text=f"🔥 Smart Saving Streak: {streaks['current']} days (best {streaks['longest']})",
         fg="#008080"
     )
 
 def predict_spending():
-    total = get_total()
-    day = datetime.now().day
-    if day == 0:
+    predicted = ledger.predict_spending()
+    if predicted is None:
+        messagebox.showinfo("AI Prediction 🤖", "Not enough history yet. Forecasts start after your first full day.")
         return
-    predicted = (total / day) * 30
-    messagebox.showinfo(
-        "AI Prediction 🤖",
-        f"Estimated End-of-Month Spending:\n₹{round(predicted,2)}"
-    )
+
+    lines = [
+        f"Estimated End-of-Month Spending:\n₹{round(predicted['expected'],2)}",
+        f"Likely range: ₹{round(predicted['low'],2)} – ₹{round(predicted['high'],2)}",
+        ""
+    ]
+    for category, category_predicted in ledger.category_forecasts().items():
+        lines.append(f"{category}: ₹{round(category_predicted['expected'],2)}")
+    messagebox.showinfo("AI Prediction 🤖", "\n".join(lines))
 
 def show_charts():
-    if not data["expenses"]:
+    global analytics
+    # With a history filter applied the charts show just the matching expenses
+    source = filtered or ledger
+    if not len(source.store):
         messagebox.showinfo("No Data", "No expenses to show!")
         return
 
-    category_totals = {}
-    date_totals = {}
-
-    for exp in data["expenses"]:
-        category_totals[exp["category"]] = category_totals.get(exp["category"], 0) + exp["amount"]
-        date_totals[exp["date"]] = date_totals.get(exp["date"], 0) + exp["amount"]
-
-    # Create a new window for charts
-    chart_window = tk.Toplevel(root)
-    chart_window.title("Expense Analytics")
-    chart_window.geometry("1000x600")
-    chart_window.config(bg=COLORS["secondary"])
-
-    fig = Figure(figsize=(12, 5.5), dpi=100, facecolor=COLORS["secondary"], edgecolor='none')
-    
-    # Modern color palette for charts
-    chart_colors = [COLORS["accent"], COLORS["success"], COLORS["warning"], 
-                   COLORS["danger"], COLORS["soft_purple"]]
-
-    # Pie chart
-    ax1 = fig.add_subplot(131)
-    categories = list(category_totals.keys())
-    amounts = list(category_totals.values())
-    wedges, texts, autotexts = ax1.pie(amounts, labels=categories, autopct='%1.1f%%',
-                                         colors=chart_colors, startangle=90,
-                                         textprops={"fontsize": 10, "weight": "bold"})
-    ax1.set_title("Category Distribution", fontsize=12, weight="bold", color=COLORS["text"])
-    for autotext in autotexts:
-        autotext.set_color("white")
-
-    # Bar chart
-    ax2 = fig.add_subplot(132)
-    bars = ax2.bar(categories, amounts, color=chart_colors, edgecolor=COLORS["text"], linewidth=1.5)
-    ax2.set_title("Category Spending", fontsize=12, weight="bold", color=COLORS["text"])
-    ax2.tick_params(axis='x', rotation=45, labelsize=9)
-    ax2.set_ylabel("Amount (₹)", fontsize=10, weight="bold")
-    ax2.grid(axis='y', alpha=0.3, linestyle='--')
-
-    # Trend line chart
-    ax3 = fig.add_subplot(133)
-    dates = sorted(date_totals.keys())
-    date_amounts = [date_totals[d] for d in dates]
-    ax3.plot(dates, date_amounts, marker='o', linewidth=2.5, markersize=8, 
-             color=COLORS["accent"], markerfacecolor=COLORS["success"], 
-             markeredgewidth=2, markeredgecolor=COLORS["accent"])
-    ax3.fill_between(range(len(dates)), date_amounts, alpha=0.2, color=COLORS["accent"])
-    ax3.set_title("Daily Spending Trend", fontsize=12, weight="bold", color=COLORS["text"])
-    ax3.tick_params(axis='x', rotation=45, labelsize=9)
-    ax3.set_ylabel("Amount (₹)", fontsize=10, weight="bold")
-    ax3.grid(alpha=0.3, linestyle='--')
-
-    fig.tight_layout()
-    canvas = FigureCanvasTkAgg(fig, master=chart_window)
-    canvas.draw()
-    canvas.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=10)
-
-    chart_window.config(bg=COLORS["secondary"])
+    if analytics is None:
+        analytics = AnalyticsWindow(root, source)
+    analytics.show()
 
 def generate_report():
-    total = get_total()
-    limit_amt = data["monthly_limit"]
+    report = ledger.generate_report()
 
-    if limit_amt == 0:
+    if report is None:
         messagebox.showwarning("Set Limit", "Please set monthly limit first!")
         return
 
-    usage = (total / limit_amt) * 100
-    score = max(0, 100 - usage)
-
-    if usage <= 50:
-        status = "🏆 Excellent"
-    elif usage <= 80:
-        status = "👍 Good"
-    elif usage <= 100:
-        status = "⚠️ Risk Zone"
-    else:
-        status = "🚨 Critical"
-
-    report_text = f"""
-📊 MONTHLY REPORT
--------------------------
-Total Spent: ₹{total}
-Limit: ₹{limit_amt}
-Usage: {round(usage,2)}%
-
-💯 Financial Health Score: {round(score,1)}/100
-Status: {status}
-"""
-
-    messagebox.showinfo("Monthly Report", report_text)
+    messagebox.showinfo("Monthly Report", core.format_report(report))
 
 # 🔄 RESET FUNCTION ADDED
 def reset_month():
     confirm = messagebox.askyesno(
         "Reset Confirmation",
-        "Are you sure you want to reset everything for a new month?\n\nThis will clear all expenses, limits, and streak."
+        "Are you sure you want to reset everything for a new month?\n\nThis will archive this month's expenses and clear limits and streak."
     )
 
     if confirm:
-        data["monthly_limit"] = 0
-        data["daily_limit"] = 0
-        data["expenses"] = []
-        data["streak"] = 0
+        ledger.reset_month()
+        refresh.request("history", "status")
 
-        # Clear Treeview items
-        for item in expense_list.get_children():
-            expense_list.delete(item)
-        progress['value'] = 0
+        messagebox.showinfo("Reset Done ✅", "New Month Started Successfully!")
 
-        save_data()
-        update_status()
+# 🔍 HISTORY FILTERS
+def read_filters():
+    """Query arguments from the filter fields; None when every field is empty"""
+    def amount(text):
+        return float(text) if text.strip() else None
+
+    category = filter_category_var.get()
+    filters = {
+        "first": filter_from_entry.get().strip() or None,
+        "last": filter_to_entry.get().strip() or None,
+        "categories": None if category == "All" else [category],
+        "min_amount": amount(filter_min_entry.get()),
+        "max_amount": amount(filter_max_entry.get())
+    }
+    return filters if any(value is not None for value in filters.values()) else None
 
-        messagebox.showinfo("Reset Done ✅", "New Month Started Successfully!")
+def apply_filter():
+    global active_filter, filtered
+    try:
+        filters = read_filters()
+        view = FilteredView(ledger, filters) if filters else None
+    except ValueError:
+        messagebox.showerror("Error ❌", "Dates must be YYYY-MM-DD and amounts numbers")
+        return
+    active_filter, filtered = filters, view
+    refresh_history(follow=True)
+
+def clear_filter():
+    for field in (filter_from_entry, filter_to_entry, filter_min_entry, filter_max_entry):
+        field.delete(0, tk.END)
+    filter_category_var.set("All")
+    apply_filter()
+
+def refresh_history(follow=None):
+    """Point the history and the charts at the ledger, or at the filtered matches while a filter is applied"""
+    global filtered
+    if active_filter is not None and not filtered.current(ledger) and not filtered.catch_up(ledger):
+        filtered = FilteredView(ledger, active_filter)
+    source = filtered or ledger
+    history.store = source.store
+    history.refresh(follow)
+    if filtered is not None:
+        configure_if_changed(filter_result_label, text=f"{len(filtered.store)} matching, ₹{filtered.total}")
+    else:
+        configure_if_changed(filter_result_label, text="")
+    if analytics is not None and analytics.source is not source:
+        analytics.source = source
+        analytics.rendered_version = None
+
+# 🎯 BUDGETS
+def show_budget_alerts():
+    alerts = ledger.pop_alerts()
+    if alerts:
+        messagebox.showwarning("Budget Alert 🎯", "\n".join(expense_budgets.format_alert(alert) for alert in alerts))
+
+def update_budget_list():
+    lines = [
+        f"{entry['name']}: {entry['category'] or 'All'}, {expense_budgets.PERIOD_NAMES[entry['period']]}  "
+        f"₹{round(entry['spent'],2)} / ₹{entry['limit']} ({entry['usage']:.0f}%)"
+        for entry in ledger.budget_status()
+    ]
+    configure_if_changed(budget_list_label, text="\n".join(lines) or "No budgets yet")
+
+def save_budget():
+    try:
+        limit = float(budget_limit_entry.get())
+    except ValueError:
+        messagebox.showerror("Error ❌", "Enter a valid limit")
+        return
+    category = budget_category_var.get()
+    try:
+        ledger.set_budget(budget_name_entry.get(), limit, None if category == "All" else category,
+                          budget_period_var.get(), budget_start_entry.get().strip() or None,
+                          budget_end_entry.get().strip() or None)
+    except ValueError as e:
+        messagebox.showerror("Error ❌", str(e))
+        return
+    update_budget_list()
+
+def remove_budget():
+    try:
+        ledger.remove_budget(budget_name_entry.get().strip())
+    except ValueError as e:
+        messagebox.showerror("Error ❌", str(e))
+        return
+    update_budget_list()
+
+def show_budgets():
+    global budget_window, budget_list_label, budget_name_entry, budget_limit_entry
+    global budget_category_var, budget_period_var, budget_start_entry, budget_end_entry
+    budget_window = tk.Toplevel(root)
+    budget_window.title("Budgets")
+    budget_window.geometry("450x560")
+    budget_window.config(bg=COLORS["secondary"])
+
+    tk.Label(budget_window, text="🎯 Budgets", font=("Helvetica", 20, "bold"),
+             bg=COLORS["secondary"], fg=COLORS["primary"]).pack(pady=15)
+
+    budget_list_label = tk.Label(budget_window, text="", font=FONTS["body"], justify="left",
+                                 anchor="w", bg=COLORS["light"], fg=COLORS["text"])
+    budget_list_label.pack(fill="x", padx=30, ipady=8)
+
+    form = tk.Frame(budget_window, bg=COLORS["secondary"])
+    form.pack(fill="x", padx=30, pady=15)
+
+    def field(row, text):
+        tk.Label(form, text=text, font=FONTS["body"], bg=COLORS["secondary"],
+                 fg=COLORS["text"]).grid(row=row, column=0, sticky="w", pady=4)
+
+    def entry(row):
+        widget = tk.Entry(form, font=FONTS["body"], relief="flat", bg=COLORS["light"], fg=COLORS["text"])
+        widget.grid(row=row, column=1, sticky="ew", pady=4, ipady=4)
+        return widget
+
+    form.columnconfigure(1, weight=1)
+    field(0, "Name")
+    budget_name_entry = entry(0)
+    field(1, "Category")
+    budget_category_var = tk.StringVar(budget_window)
+    budget_category_var.set("All")
+    ttk.Combobox(form, textvariable=budget_category_var, values=["All", *core.CATEGORIES],
+                 state="readonly", font=FONTS["body"]).grid(row=1, column=1, sticky="ew", pady=4)
+    field(2, "Period")
+    budget_period_var = tk.StringVar(budget_window)
+    budget_period_var.set("month")
+    ttk.Combobox(form, textvariable=budget_period_var, values=expense_budgets.PERIODS,
+                 state="readonly", font=FONTS["body"]).grid(row=2, column=1, sticky="ew", pady=4)
+    field(3, "Limit (₹)")
+    budget_limit_entry = entry(3)
+    field(4, "Start (range)")
+    budget_start_entry = entry(4)
+    field(5, "End (range)")
+    budget_end_entry = entry(5)
+
+    ModernButton(budget_window, "✨ Save Budget", command=save_budget,
+                 bg_color=COLORS["accent"], width=20).pack(pady=(10, 5), padx=30, fill="x")
+    ModernButton(budget_window, "🗑 Remove by Name", command=remove_budget,
+                 bg_color=COLORS["danger"], width=20).pack(pady=5, padx=30, fill="x")
+
+    update_budget_list()
+
+# 👛 WALLETS
+def switch_wallet(event=None):
+    global ledger, latest_anomaly
+    ledger = wallets.open(wallet_var.get())
+    latest_anomaly = None
+    history.following = True
+    refresh.request("history", "status")
+
+    if ledger.recovered_from:
+        messagebox.showwarning("Data Recovery ⚠️",
+                               f"The saved data could not be read and was moved to\n{ledger.recovered_from}")
+
+def new_wallet():
+    name = simpledialog.askstring("New Wallet", "Wallet name:", parent=root)
+    if not name:
+        return
+    try:
+        wallets.create(name.strip())
+    except ValueError as e:
+        messagebox.showerror("Error ❌", str(e))
+        return
+    wallet_menu.config(values=wallets.names())
+    wallet_var.set(name.strip())
+    switch_wallet()
+
+# 📥 BULK IMPORT
+def import_expenses():
+    path = filedialog.askopenfilename(
+        title="Import Bank Statement",
+        filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+    )
+    if not path:
+        return
+
+    # Parsing runs on a worker thread; the bounded queue keeps it only a few batches ahead
+    batches = queue.Queue(maxsize=4)
+
+    def parse_worker():
+        try:
+            for batch in expense_import.iter_batches(path):
+                batches.put(batch)
+        except Exception as e:
+            batches.put(e)
+        batches.put(None)
+
+    import_btn.config(state="disabled")
+    # Batches always go to the wallet the import started in
+    if wallets is not None:
+        wallet_menu.config(state="disabled")
+        new_wallet_btn.config(state="disabled")
+    threading.Thread(target=parse_worker, daemon=True).start()
+    root.after(50, poll_import, batches, [0, 0])
+
+def poll_import(batches, counts):
+    """Commit one parsed batch per tick on the Tk thread; the refresh after it is coalesced"""
+    global import_fraction
+    try:
+        batch = batches.get_nowait()
+    except queue.Empty:
+        root.after(50, poll_import, batches, counts)
+        return
+
+    if batch is None or isinstance(batch, Exception):
+        import_btn.config(state="normal")
+        if wallets is not None:
+            wallet_menu.config(state="readonly")
+            new_wallet_btn.config(state="normal")
+        import_fraction = None
+        refresh.request("history", "status")
+        if batch is None:
+            messagebox.showinfo("Import Done ✅",
+                                f"Imported {counts[0]} expenses\nSkipped {counts[1]} rows")
+        else:
+            messagebox.showerror("Import Failed ❌", str(batch))
+        return
+
+    expenses, skipped, fraction = batch
+    if expenses:
+        ledger.add_expenses(expenses)
+        stats.count("imported rows", len(expenses))
+    counts[0] += len(expenses)
+    counts[1] += skipped
+
+    import_fraction = fraction
+    refresh.request("history", "status")
+
+    # Yield to the event loop between batches so the window keeps repainting
+    root.after(1, poll_import, batches, counts)
+
+# 🖨 REPORT EXPORT
+def export_report():
+    directory = filedialog.askdirectory(title="Save Report To")
+    if not directory:
+        return
+
+    global reports_pending
+    title = wallet_var.get() if wallets is not None else os.path.splitext(os.path.basename(ledger.data_file))[0]
+    # Only the month's rows are copied here; aggregates and rendering happen on a worker
+    job = expense_reports.build_job(ledger, core.month_str(), title, directory)
+    reports.submit(job, report_results.put)
+    reports_pending += 1
+    if reports_pending == 1:
+        root.after(100, poll_reports)
+
+def poll_reports():
+    """Pick up finished reports on the Tk thread; rendering never runs here"""
+    global reports_pending
+    while True:
+        try:
+            result = report_results.get_nowait()
+        except queue.Empty:
+            break
+        reports_pending -= 1
+        if isinstance(result, Exception):
+            messagebox.showerror("Report Failed ❌", str(result))
+        else:
+            messagebox.showinfo("Report Saved 📄", "Saved:\n" + "\n".join(result["files"]))
+    if reports_pending:
+        root.after(100, poll_reports)
+
+# 💾 DISK WRITES
+WRITE_CHECK_MS = 1000
+
+def check_writes():
+    """Report a failed background write once; the persister keeps retrying it"""
+    global write_error_shown
+    error = ledger.pop_write_error()
+    if error is not None and str(error) != write_error_shown:
+        write_error_shown = str(error)
+        messagebox.showerror("Save Failed ❌", f"Changes could not be written to disk and will be retried:\n{error}")
+    root.after(WRITE_CHECK_MS, check_writes)
+
+# 🔁 SYNC
+def sync_now():
+    """Exchange ops with the server on a worker thread; poll_sync applies what comes back"""
+    def exchange():
+        try:
+            sync_results.put(sync_client.exchange())
+        except OSError as e:
+            sync_results.put(e)
+
+    threading.Thread(target=exchange, name="sync", daemon=True).start()
+    root.after(100, poll_sync)
+
+def poll_sync():
+    try:
+        result = sync_results.get_nowait()
+    except queue.Empty:
+        root.after(100, poll_sync)
+        return
+
+    try:
+        if isinstance(result, Exception):
+            configure_if_changed(sync_label, text=f"🔁 Offline, {len(sync_client.outbox)} expenses queued",
+                                 fg=COLORS["warning"])
+        else:
+            if sync_client.apply(*result):
+                refresh.request("history", "status")
+            text = f"🔁 Synced with {sync_client.url}"
+            if sync_client.rejected:
+                text += f" ({sync_client.rejected} skipped, see {os.path.basename(sync_client.rejects_file)})"
+            configure_if_changed(sync_label, text=text, fg=COLORS["success"])
+    except Exception as e:
+        configure_if_changed(sync_label, text=f"🔁 Sync error: {e}", fg=COLORS["danger"])
+    finally:
+        # One round at a time, so applying never overlaps the next exchange
+        root.after(int(expense_sync.INTERVAL * 1000), sync_now)
+
+# -------- STATS PANEL -------- #
+def update_stats_panel():
+    configure_if_changed(stats_label, text=stats.summary(limit=8))
+    root.after(1000, update_stats_panel)
+
+def toggle_profile():
+    path = stats.toggle_profile()
+    profile_btn.config(text="⏹ Stop Profile" if path is None else "⏺ Profile")
+    if path:
+        messagebox.showinfo("Profile Saved", f"cProfile output written to\n{path}")
+
+def dump_memory():
+    path = stats.dump_memory()
+    if path is None:
+        messagebox.showinfo("Memory Tracing", "Memory tracing started.\nDump again to save a snapshot.")
+    else:
+        messagebox.showinfo("Memory Snapshot Saved", f"tracemalloc snapshot written to\n{path}")
 
 # -------- MODERN UI -------- #
 
-root = tk.Tk()
-root.title("💰 Smart Expense Tracker PRO")
-root.geometry("900x1000")
-root.config(bg=COLORS["secondary"])
-root.resizable(True, True)
-
-# Create style for ttk widgets
-style = ttk.Style()
-style.theme_use('clam')
-style.configure('TProgressbar', 
-                background=COLORS["success"],
-                troughcolor=COLORS["light"],
-                bordercolor=COLORS["text"],
-                lightcolor=COLORS["success"],
-                darkcolor=COLORS["success"])
+analytics = None
+active_filter = None  # query arguments of the applied history filter
+filtered = None       # FilteredView for active_filter
+limit_window = None
+budget_window = None
+latest_anomaly = None
+import_fraction = None
+write_error_shown = None
+
+# Workers are spawned; they import this file, which only builds the window under main()
+reports = expense_reports.ReportPool()
+report_results = queue.Queue()
+reports_pending = 0
+sync_results = queue.Queue()
 
 # -------- SETUP LIMITS WINDOW -------- #
 def setup_limits():
     global limit_window, monthly_entry, daily_entry
+    if limit_window is not None and limit_window.winfo_exists():
+        limit_window.lift()
+        return
     limit_window = tk.Toplevel(root)
     limit_window.title("Set Your Budget Limits")
     limit_window.geometry("450x450")
@@ -407,6 +970,8 @@ def setup_limits():
     monthly_entry = tk.Entry(monthly_frame, font=("Helvetica", 16), relief="flat",
                             borderwidth=2, bg=COLORS["light"], fg=COLORS["text"])
     monthly_entry.pack(fill="x", ipady=12)
+    if ledger.data["monthly_limit"]:
+        monthly_entry.insert(0, ledger.data["monthly_limit"])
 
     # Daily limit frame
     daily_frame = tk.Frame(limit_window, bg=COLORS["secondary"])
@@ -417,6 +982,8 @@ def setup_limits():
     daily_entry = tk.Entry(daily_frame, font=("Helvetica", 16), relief="flat",
                           borderwidth=2, bg=COLORS["light"], fg=COLORS["text"])
     daily_entry.pack(fill="x", ipady=12)
+    if ledger.data["daily_limit"]:
+        daily_entry.insert(0, ledger.data["daily_limit"])
 
     # Save button
     save_btn = ModernButton(limit_window, "✨ Save Limits", command=set_limits,
@@ -425,189 +992,410 @@ def setup_limits():
 
     limit_window.grab_set()
 
-# -------- MAIN TITLE -------- #
-title_frame = tk.Frame(root, bg=COLORS["primary"])
-title_frame.pack(fill="x", padx=0, pady=0)
-
-title = tk.Label(title_frame, text="💰 SMART EXPENSE MANAGER",
-                font=FONTS["title"], bg=COLORS["primary"],
-                fg=COLORS["light"])
-title.pack(pady=20)
-
-subtitle = tk.Label(title_frame, text="Manage Your Budget Intelligently",
-                   font=FONTS["small"], bg=COLORS["primary"],
-                   fg=COLORS["soft_blue"])
-subtitle.pack(pady=(0, 15))
-
-# -------- INPUT SECTION -------- #
-input_section = tk.Frame(root, bg=COLORS["secondary"])
-input_section.pack(fill="x", padx=20, pady=15)
-
-tk.Label(input_section, text="Add New Expense", font=FONTS["subheading"],
-        bg=COLORS["secondary"], fg=COLORS["primary"]).pack(anchor="w", pady=(0, 10))
-
-input_frame = tk.Frame(input_section, bg=COLORS["light"])
-input_frame.pack(fill="x", pady=10, padx=10, ipady=10)
-
-# Amount input
-amount_label = tk.Label(input_frame, text="Amount (₹)", font=FONTS["body"],
-                       bg=COLORS["light"], fg=COLORS["text"])
-amount_label.grid(row=0, column=0, padx=5, pady=5, sticky="w")
-
-amount_entry = tk.Entry(input_frame, font=FONTS["body"], relief="flat",
-                       borderwidth=1, bg="white", fg=COLORS["text"], width=15)
-amount_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
-
-# Category selection
-category_label = tk.Label(input_frame, text="Category", font=FONTS["body"],
-                         bg=COLORS["light"], fg=COLORS["text"])
-category_label.grid(row=0, column=2, padx=5, pady=5, sticky="w")
-
-categories = ["Food", "Travel", "Shopping", "Bills", "Entertainment", "Other"]
-category_var = tk.StringVar(root)
-category_var.set(categories[0])
-
-category_menu = ttk.Combobox(input_frame, textvariable=category_var, 
-                            values=categories, state="readonly", width=15, font=FONTS["body"])
-category_menu.grid(row=0, column=3, padx=5, pady=5)
-
-# Add button
-add_btn = ModernButton(input_frame, "➕ Add", command=add_expense,
-                      bg_color=COLORS["accent"], width=8)
-add_btn.grid(row=0, column=4, padx=5, pady=5)
-
-input_frame.columnconfigure(1, weight=1)
-input_frame.columnconfigure(3, weight=1)
-
-# -------- STATISTICS SECTION -------- #
-stats_section = tk.Frame(root, bg=COLORS["secondary"])
-stats_section.pack(fill="x", padx=20, pady=15)
+# -------- MAIN WINDOW -------- #
+def build_window():
+    """Build the main window; everything that needs the ledger starts disabled"""
+    global root, amount_entry, category_var, total_label, daily_label, remaining_label
+    global status_label, progress, streak_label, advice_label, import_btn, filter_from_entry
+    global filter_to_entry, filter_category_var, filter_min_entry, filter_max_entry
+    global filter_result_label, history, refresh, ledger_controls, wallet_var, wallet_menu
+    global new_wallet_btn, sync_label, stats_label, profile_btn
+
+    root = tk.Tk()
+    root.title("💰 Smart Expense Tracker PRO")
+    root.geometry("900x1000")
+    root.config(bg=COLORS["secondary"])
+    root.resizable(True, True)
+
+    # Create style for ttk widgets
+    style = ttk.Style()
+    style.theme_use('clam')
+    style.configure('TProgressbar', 
+                    background=COLORS["success"],
+                    troughcolor=COLORS["light"],
+                    bordercolor=COLORS["text"],
+                    lightcolor=COLORS["success"],
+                    darkcolor=COLORS["success"])
+
+    # -------- MAIN TITLE -------- #
+    title_frame = tk.Frame(root, bg=COLORS["primary"])
+    title_frame.pack(fill="x", padx=0, pady=0)
+
+    title = tk.Label(title_frame, text="💰 SMART EXPENSE MANAGER",
+                    font=FONTS["title"], bg=COLORS["primary"],
+                    fg=COLORS["light"])
+    title.pack(pady=20)
+
+    subtitle = tk.Label(title_frame, text="Manage Your Budget Intelligently",
+                       font=FONTS["small"], bg=COLORS["primary"],
+                       fg=COLORS["soft_blue"])
+    subtitle.pack(pady=(0, 15))
+
+    # -------- WALLET SECTION -------- #
+    if wallets is not None:
+        wallet_section = tk.Frame(root, bg=COLORS["secondary"])
+        wallet_section.pack(fill="x", padx=20, pady=(15, 0))
+
+        tk.Label(wallet_section, text="👛 Wallet", font=FONTS["subheading"],
+                bg=COLORS["secondary"], fg=COLORS["primary"]).pack(side="left")
+
+        wallet_var = tk.StringVar(root)
+        wallet_var.set(wallet_name)
+        wallet_menu = ttk.Combobox(wallet_section, textvariable=wallet_var, values=wallets.names(),
+                                   state="readonly", width=25, font=FONTS["body"])
+        wallet_menu.pack(side="left", padx=10)
+        wallet_menu.bind("<<ComboboxSelected>>", switch_wallet)
+
+        new_wallet_btn = tk.Button(wallet_section, text="➕ New Wallet", command=new_wallet,
+                                   relief="flat", bg=COLORS["soft_green"], fg=COLORS["text"])
+        new_wallet_btn.pack(side="left")
+
+    # -------- SYNC STATUS -------- #
+    if options.sync:
+        sync_label = tk.Label(root, text="🔁 Connecting...", font=FONTS["small"],
+                              bg=COLORS["secondary"], fg=COLORS["text"])
+        sync_label.pack(anchor="e", padx=20, pady=(10, 0))
+
+    # -------- INPUT SECTION -------- #
+    input_section = tk.Frame(root, bg=COLORS["secondary"])
+    input_section.pack(fill="x", padx=20, pady=15)
+
+    tk.Label(input_section, text="Add New Expense", font=FONTS["subheading"],
+            bg=COLORS["secondary"], fg=COLORS["primary"]).pack(anchor="w", pady=(0, 10))
+
+    input_frame = tk.Frame(input_section, bg=COLORS["light"])
+    input_frame.pack(fill="x", pady=10, padx=10, ipady=10)
+
+    # Amount input
+    amount_label = tk.Label(input_frame, text="Amount (₹)", font=FONTS["body"],
+                           bg=COLORS["light"], fg=COLORS["text"])
+    amount_label.grid(row=0, column=0, padx=5, pady=5, sticky="w")
+
+    amount_entry = tk.Entry(input_frame, font=FONTS["body"], relief="flat",
+                           borderwidth=1, bg="white", fg=COLORS["text"], width=15)
+    amount_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+
+    # Category selection
+    category_label = tk.Label(input_frame, text="Category", font=FONTS["body"],
+                             bg=COLORS["light"], fg=COLORS["text"])
+    category_label.grid(row=0, column=2, padx=5, pady=5, sticky="w")
+
+    categories = core.CATEGORIES
+    category_var = tk.StringVar(root)
+    category_var.set(categories[0])
+
+    category_menu = ttk.Combobox(input_frame, textvariable=category_var, 
+                                values=categories, state="readonly", width=15, font=FONTS["body"])
+    category_menu.grid(row=0, column=3, padx=5, pady=5)
+
+    # Add button
+    add_btn = ModernButton(input_frame, "➕ Add", command=add_expense,
+                          bg_color=COLORS["accent"], width=8)
+    add_btn.grid(row=0, column=4, padx=5, pady=5)
+
+    input_frame.columnconfigure(1, weight=1)
+    input_frame.columnconfigure(3, weight=1)
+
+    # -------- STATISTICS SECTION -------- #
+    stats_section = tk.Frame(root, bg=COLORS["secondary"])
+    stats_section.pack(fill="x", padx=20, pady=15)
+
+    tk.Label(stats_section, text="Financial Overview", font=FONTS["subheading"],
+            bg=COLORS["secondary"], fg=COLORS["primary"]).pack(anchor="w", pady=(0, 10))
+
+    # Stats cards
+    stats_frame = tk.Frame(stats_section, bg=COLORS["secondary"])
+    stats_frame.pack(fill="x")
+
+    # Total spent card
+    total_card = tk.Frame(stats_frame, bg=COLORS["light"], relief="flat", borderwidth=0)
+    total_card.pack(side="left", fill="both", expand=True, padx=5, pady=5, ipady=15, ipadx=15)
+
+    tk.Label(total_card, text="📊 Monthly Spent", font=FONTS["body"],
+            bg=COLORS["light"], fg=COLORS["text"]).pack(anchor="w")
+    total_label = tk.Label(total_card, text="₹0", font=("Helvetica", 18, "bold"),
+                          bg=COLORS["light"], fg=COLORS["accent"])
+    total_label.pack(anchor="w", pady=(5, 0))
+
+    # Daily spent card
+    daily_card = tk.Frame(stats_frame, bg=COLORS["soft_green"], relief="flat", borderwidth=0)
+    daily_card.pack(side="left", fill="both", expand=True, padx=5, pady=5, ipady=15, ipadx=15)
+
+    tk.Label(daily_card, text="📅 Today Spent", font=FONTS["body"],
+            bg=COLORS["soft_green"], fg=COLORS["text"]).pack(anchor="w")
+    daily_label = tk.Label(daily_card, text="₹0", font=("Helvetica", 18, "bold"),
+                          bg=COLORS["soft_green"], fg=COLORS["success"])
+    daily_label.pack(anchor="w", pady=(5, 0))
+
+    # Remaining card
+    remaining_card = tk.Frame(stats_frame, bg=COLORS["soft_blue"], relief="flat", borderwidth=0)
+    remaining_card.pack(side="left", fill="both", expand=True, padx=5, pady=5, ipady=15, ipadx=15)
+
+    tk.Label(remaining_card, text="💰 Remaining", font=FONTS["body"],
+            bg=COLORS["soft_blue"], fg=COLORS["text"]).pack(anchor="w")
+    remaining_label = tk.Label(remaining_card, text="₹0", font=("Helvetica", 18, "bold"),
+                              bg=COLORS["soft_blue"], fg=COLORS["accent"])
+    remaining_label.pack(anchor="w", pady=(5, 0))
+
+    # -------- STATUS SECTION -------- #
+    status_section = tk.Frame(root, bg=COLORS["secondary"])
+    status_section.pack(fill="x", padx=20, pady=15)
+
+    status_label = tk.Label(status_section, text="⏳ Loading...", font=FONTS["heading"],
+                           bg=COLORS["secondary"], fg=COLORS["text"])
+    status_label.pack(pady=5)
+
+    # Progress bar with styling
+    progress_section = tk.Frame(status_section, bg=COLORS["secondary"])
+    progress_section.pack(fill="x", pady=10)
+
+    progress = ttk.Progressbar(progress_section, length=500, mode='determinate',
+                              style='TProgressbar', value=0)
+    progress.pack(fill="x", ipady=3)
+
+    # -------- MOTIVATIONAL SECTION -------- #
+    motivation_section = tk.Frame(root, bg=COLORS["secondary"])
+    motivation_section.pack(fill="x", padx=20, pady=15)
+
+    streak_label = tk.Label(motivation_section, text="🔥 Streak: 0 days",
+                           font=FONTS["heading"], bg=COLORS["secondary"],
+                           fg=COLORS["warning"])
+    streak_label.pack(pady=5)
+
+    advice_label = tk.Label(motivation_section, text="", font=FONTS["small"],
+                           bg=COLORS["secondary"], fg=COLORS["text"],
+                           wraplength=700, justify="center")
+    advice_label.pack(pady=5)
+
+    # -------- ACTION BUTTONS SECTION -------- #
+    button_section = tk.Frame(root, bg=COLORS["secondary"])
+    button_section.pack(fill="x", padx=20, pady=15)
+
+    btn_frame_1 = tk.Frame(button_section, bg=COLORS["secondary"])
+    btn_frame_1.pack(fill="x", pady=5)
+
+    predict_btn = ModernButton(btn_frame_1, "🤖 Predict Spending", command=predict_spending,
+                              bg_color=COLORS["accent"], width=20)
+    predict_btn.pack(side="left", padx=5, fill="x", expand=True)
+
+    charts_btn = ModernButton(btn_frame_1, "📊 Analytics", command=show_charts,
+                             bg_color=COLORS["success"], width=20)
+    charts_btn.pack(side="left", padx=5, fill="x", expand=True)
+
+    limits_btn = ModernButton(btn_frame_1, "⚙️ Limits", command=setup_limits,
+                             bg_color=COLORS["primary"], width=20)
+    limits_btn.pack(side="left", padx=5, fill="x", expand=True)
+
+    btn_frame_2 = tk.Frame(button_section, bg=COLORS["secondary"])
+    btn_frame_2.pack(fill="x", pady=5)
+
+    report_btn = ModernButton(btn_frame_2, "📄 Report", command=generate_report,
+                             bg_color=COLORS["warning"], width=20)
+    report_btn.pack(side="left", padx=5, fill="x", expand=True)
+
+    budgets_btn = ModernButton(btn_frame_2, "🎯 Budgets", command=show_budgets,
+                              bg_color=COLORS["success"], width=20)
+    budgets_btn.pack(side="left", padx=5, fill="x", expand=True)
+
+    reset_btn = ModernButton(btn_frame_2, "🔄 Reset Month", command=reset_month,
+                            bg_color=COLORS["danger"], width=20)
+    reset_btn.pack(side="left", padx=5, fill="x", expand=True)
+
+    btn_frame_3 = tk.Frame(button_section, bg=COLORS["secondary"])
+    btn_frame_3.pack(fill="x", pady=5)
+
+    import_btn = ModernButton(btn_frame_3, "📥 Import CSV", command=import_expenses,
+                             bg_color=COLORS["primary"], width=20)
+    import_btn.pack(side="left", padx=5, fill="x", expand=True)
+
+    export_btn = ModernButton(btn_frame_3, "🖨 Export Report", command=export_report,
+                             bg_color=COLORS["primary"], width=20)
+    export_btn.pack(side="left", padx=5, fill="x", expand=True)
+
+    # -------- EXPENSE HISTORY SECTION -------- #
+    history_section = tk.Frame(root, bg=COLORS["secondary"])
+    history_section.pack(fill="both", expand=True, padx=20, pady=15)
+
+    tk.Label(history_section, text="Expense History", font=FONTS["subheading"],
+            bg=COLORS["secondary"], fg=COLORS["primary"]).pack(anchor="w", pady=(0, 10))
+
+    # Filters are answered from the ledger's date and category indexes
+    filter_frame = tk.Frame(history_section, bg=COLORS["light"])
+    filter_frame.pack(fill="x", pady=(0, 10), ipady=5)
+
+    def filter_entry(column, text, width):
+        tk.Label(filter_frame, text=text, font=FONTS["small"],
+                bg=COLORS["light"], fg=COLORS["text"]).grid(row=0, column=column, padx=(8, 2), pady=5, sticky="w")
+        field = tk.Entry(filter_frame, font=FONTS["body"], relief="flat",
+                         borderwidth=1, bg="white", fg=COLORS["text"], width=width)
+        field.grid(row=0, column=column + 1, padx=2, pady=5)
+        return field
+
+    filter_from_entry = filter_entry(0, "From (YYYY-MM-DD)", 11)
+    filter_to_entry = filter_entry(2, "To", 11)
+
+    tk.Label(filter_frame, text="Category", font=FONTS["small"],
+            bg=COLORS["light"], fg=COLORS["text"]).grid(row=0, column=4, padx=(8, 2), pady=5, sticky="w")
+    filter_category_var = tk.StringVar(root)
+    filter_category_var.set("All")
+    ttk.Combobox(filter_frame, textvariable=filter_category_var, values=["All", *core.CATEGORIES],
+                 state="readonly", width=12, font=FONTS["body"]).grid(row=0, column=5, padx=2, pady=5)
+
+    filter_min_entry = filter_entry(6, "Min ₹", 8)
+    filter_max_entry = filter_entry(8, "Max ₹", 8)
+
+    filter_btn = tk.Button(filter_frame, text="🔍 Filter", command=apply_filter,
+                           relief="flat", bg=COLORS["soft_blue"], fg=COLORS["text"])
+    filter_btn.grid(row=0, column=10, padx=(8, 2), pady=5)
+    clear_filter_btn = tk.Button(filter_frame, text="✖ Clear", command=clear_filter,
+                                 relief="flat", bg=COLORS["soft_orange"], fg=COLORS["text"])
+    clear_filter_btn.grid(row=0, column=11, padx=2, pady=5)
+
+    filter_result_label = tk.Label(filter_frame, text="", font=FONTS["small"],
+                                   bg=COLORS["light"], fg=COLORS["primary"])
+    filter_result_label.grid(row=0, column=12, padx=8, pady=5, sticky="e")
+    filter_frame.columnconfigure(12, weight=1)
+
+    # Create Treeview for expenses
+    tree_frame = tk.Frame(history_section, bg=COLORS["light"], relief="flat", borderwidth=0)
+    tree_frame.pack(fill="both", expand=True)
+
+    columns = ("Date", "Category", "Amount")
+    expense_list = ttk.Treeview(tree_frame, columns=columns, height=10, show="headings",
+                               style='Treeview')
+
+    expense_list.column("Date", width=100, anchor="center")
+    expense_list.column("Category", width=150, anchor="w")
+    expense_list.column("Amount", width=100, anchor="e")
+
+    expense_list.heading("Date", text="📅 Date")
+    expense_list.heading("Category", text="🏷️ Category")
+    expense_list.heading("Amount", text="💵 Amount")
+
+    # Scrollbar drives the virtual history rather than the Treeview itself
+    scrollbar = ttk.Scrollbar(tree_frame, orient="vertical")
+    scrollbar.pack(side="right", fill="y")
+    expense_list.pack(fill="both", expand=True)
+
+    # Empty until the ledger has been restored
+    history = VirtualHistory(expense_list, scrollbar, core.ExpenseStore())
+
+    refresh = RefreshScheduler(root)
+    refresh.register("history", refresh_history)
+    refresh.register("status", update_status)
+
+    # -------- LIVE STATS -------- #
+    if STATS:
+        stats_section = tk.Frame(root, bg=COLORS["light"])
+        stats_section.pack(fill="x", padx=20, pady=(0, 15))
+
+        stats_label = tk.Label(stats_section, text="", font=("Courier", 9), justify="left",
+                               anchor="w", bg=COLORS["light"], fg=COLORS["text"])
+        stats_label.pack(side="left", fill="x", expand=True, padx=10, pady=5)
+
+        memory_btn = tk.Button(stats_section, text="💾 Dump Memory", command=dump_memory,
+                               relief="flat", bg=COLORS["soft_blue"], fg=COLORS["text"])
+        memory_btn.pack(side="right", padx=5)
+        profile_btn = tk.Button(stats_section, text="⏺ Profile", command=toggle_profile,
+                                relief="flat", bg=COLORS["soft_purple"], fg=COLORS["text"])
+        profile_btn.pack(side="right", padx=5)
+
+        update_stats_panel()
+
+    # Everything that needs the ledger stays disabled until it has been restored
+    ledger_controls = [add_btn, predict_btn, charts_btn, limits_btn, report_btn, budgets_btn,
+                       reset_btn, import_btn, export_btn, filter_btn, clear_filter_btn]
+    if wallets is not None:
+        ledger_controls.append(new_wallet_btn)
+        wallet_menu.config(state="disabled")
+    for control in ledger_controls:
+        control.config(state="disabled")
+
+# -------- STARTUP PIPELINE -------- #
+def mark_startup(stage):
+    startup_times[stage] = time.perf_counter() - STARTED
+    if stats.enabled:
+        stats.record(f"startup.{stage}", startup_times[stage])
+
+def poll_startup():
+    if restored.is_set():
+        finish_startup()
+    else:
+        root.after(STARTUP_POLL_MS, poll_startup)
 
-tk.Label(stats_section, text="Financial Overview", font=FONTS["subheading"],
-        bg=COLORS["secondary"], fg=COLORS["primary"]).pack(anchor="w", pady=(0, 10))
-
-# Stats cards
-stats_frame = tk.Frame(stats_section, bg=COLORS["secondary"])
-stats_frame.pack(fill="x")
-
-# Total spent card
-total_card = tk.Frame(stats_frame, bg=COLORS["light"], relief="flat", borderwidth=0)
-total_card.pack(side="left", fill="both", expand=True, padx=5, pady=5, ipady=15, ipadx=15)
-
-tk.Label(total_card, text="📊 Monthly Spent", font=FONTS["body"],
-        bg=COLORS["light"], fg=COLORS["text"]).pack(anchor="w")
-total_label = tk.Label(total_card, text="₹0", font=("Helvetica", 18, "bold"),
-                      bg=COLORS["light"], fg=COLORS["accent"])
-total_label.pack(anchor="w", pady=(5, 0))
-
-# Daily spent card
-daily_card = tk.Frame(stats_frame, bg=COLORS["soft_green"], relief="flat", borderwidth=0)
-daily_card.pack(side="left", fill="both", expand=True, padx=5, pady=5, ipady=15, ipadx=15)
-
-tk.Label(daily_card, text="📅 Today Spent", font=FONTS["body"],
-        bg=COLORS["soft_green"], fg=COLORS["text"]).pack(anchor="w")
-daily_label = tk.Label(daily_card, text="₹0", font=("Helvetica", 18, "bold"),
-                      bg=COLORS["soft_green"], fg=COLORS["success"])
-daily_label.pack(anchor="w", pady=(5, 0))
-
-# Remaining card
-remaining_card = tk.Frame(stats_frame, bg=COLORS["soft_blue"], relief="flat", borderwidth=0)
-remaining_card.pack(side="left", fill="both", expand=True, padx=5, pady=5, ipady=15, ipadx=15)
-
-tk.Label(remaining_card, text="💰 Remaining", font=FONTS["body"],
-        bg=COLORS["soft_blue"], fg=COLORS["text"]).pack(anchor="w")
-remaining_label = tk.Label(remaining_card, text="₹0", font=("Helvetica", 18, "bold"),
-                          bg=COLORS["soft_blue"], fg=COLORS["accent"])
-remaining_label.pack(anchor="w", pady=(5, 0))
-
-# -------- STATUS SECTION -------- #
-status_section = tk.Frame(root, bg=COLORS["secondary"])
-status_section.pack(fill="x", padx=20, pady=15)
-
-status_label = tk.Label(status_section, text="✅ Within Budget", font=FONTS["heading"],
-                       bg=COLORS["secondary"], fg=COLORS["success"])
-status_label.pack(pady=5)
-
-# Progress bar with styling
-progress_section = tk.Frame(status_section, bg=COLORS["secondary"])
-progress_section.pack(fill="x", pady=10)
-
-progress = ttk.Progressbar(progress_section, length=500, mode='determinate',
-                          style='TProgressbar', value=0)
-progress.pack(fill="x", ipady=3)
-
-# -------- MOTIVATIONAL SECTION -------- #
-motivation_section = tk.Frame(root, bg=COLORS["secondary"])
-motivation_section.pack(fill="x", padx=20, pady=15)
-
-streak_label = tk.Label(motivation_section, text="🔥 Streak: 0 days",
-                       font=FONTS["heading"], bg=COLORS["secondary"],
-                       fg=COLORS["warning"])
-streak_label.pack(pady=5)
-
-advice_label = tk.Label(motivation_section, text="", font=FONTS["small"],
-                       bg=COLORS["secondary"], fg=COLORS["text"],
-                       wraplength=700, justify="center")
-advice_label.pack(pady=5)
-
-# -------- ACTION BUTTONS SECTION -------- #
-button_section = tk.Frame(root, bg=COLORS["secondary"])
-button_section.pack(fill="x", padx=20, pady=15)
-
-btn_frame_1 = tk.Frame(button_section, bg=COLORS["secondary"])
-btn_frame_1.pack(fill="x", pady=5)
-
-predict_btn = ModernButton(btn_frame_1, "🤖 Predict Spending", command=predict_spending,
-                          bg_color=COLORS["accent"], width=20)
-predict_btn.pack(side="left", padx=5, fill="x", expand=True)
-
-charts_btn = ModernButton(btn_frame_1, "📊 Analytics", command=show_charts,
-                         bg_color=COLORS["success"], width=20)
-charts_btn.pack(side="left", padx=5, fill="x", expand=True)
-
-btn_frame_2 = tk.Frame(button_section, bg=COLORS["secondary"])
-btn_frame_2.pack(fill="x", pady=5)
-
-report_btn = ModernButton(btn_frame_2, "📄 Report", command=generate_report,
-                         bg_color=COLORS["warning"], width=20)
-report_btn.pack(side="left", padx=5, fill="x", expand=True)
-
-reset_btn = ModernButton(btn_frame_2, "🔄 Reset Month", command=reset_month,
-                        bg_color=COLORS["danger"], width=20)
-reset_btn.pack(side="left", padx=5, fill="x", expand=True)
-
-# -------- EXPENSE HISTORY SECTION -------- #
-history_section = tk.Frame(root, bg=COLORS["secondary"])
-history_section.pack(fill="both", expand=True, padx=20, pady=15)
-
-tk.Label(history_section, text="Expense History", font=FONTS["subheading"],
-        bg=COLORS["secondary"], fg=COLORS["primary"]).pack(anchor="w", pady=(0, 10))
-
-# Create Treeview for expenses
-tree_frame = tk.Frame(history_section, bg=COLORS["light"], relief="flat", borderwidth=0)
-tree_frame.pack(fill="both", expand=True)
-
-columns = ("Date", "Category", "Amount")
-expense_list = ttk.Treeview(tree_frame, columns=columns, height=10, show="headings",
-                           style='Treeview')
-
-expense_list.column("Date", width=100, anchor="center")
-expense_list.column("Category", width=150, anchor="w")
-expense_list.column("Amount", width=100, anchor="e")
-
-expense_list.heading("Date", text="📅 Date")
-expense_list.heading("Category", text="🏷️ Category")
-expense_list.heading("Amount", text="💵 Amount")
-
-# Scrollbar
-scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=expense_list.yview)
-expense_list.configure(yscroll=scrollbar.set)
-scrollbar.pack(side="right", fill="y")
-expense_list.pack(fill="both", expand=True)
-
-# Initialize with limit setup
-setup_limits()
-
-# Update display
-update_status()
-root.mainloop()
\ No newline at end of file
+def finish_startup():
+    if restore_error is not None:
+        messagebox.showerror("Error ❌", f"The ledger could not be opened:\n{restore_error}")
+        root.destroy()
+        return
+
+    history.store = ledger.store
+    history.refresh(follow=True)
+    update_status()
+    for control in ledger_controls:
+        control.config(state="normal")
+    if wallets is not None:
+        wallet_menu.config(state="readonly", values=wallets.names())
+    mark_startup("interactive")
+    check_writes()
+    if sync_client is not None:
+        sync_now()
+
+    if ledger.recovered_from:
+        messagebox.showwarning("Data Recovery ⚠️",
+                               f"The saved data could not be read and was moved to\n{ledger.recovered_from}")
+    # Only a ledger without limits asks for them up front
+    if not ledger.data["monthly_limit"]:
+        setup_limits()
+
+def on_close():
+    try:
+        reports.close()
+        # A ledger still being restored is waited for, so it is closed cleanly too
+        restored.wait()
+        if wallets is not None:
+            wallets.close()
+        elif ledger is not None:
+            ledger.close()
+    except Exception as e:
+        messagebox.showerror("Save Failed ❌", f"Some changes could not be written to disk:\n{e}")
+    finally:
+        root.destroy()
+
+def main(argv=None):
+    global options, STATS, wallets, wallet_name
+    global update_status, smart_advice, add_expense, predict_spending, show_charts, generate_report
+    options = parser.parse_args(argv)
+    if options.sync and options.wallets:
+        parser.error("--sync shares a single ledger file; it cannot be combined with --wallets")
+
+    STATS = options.stats or stats.env_enabled()
+    if STATS:
+        stats.enable()
+        stats.instrument_engine()
+        update_status = stats.timed("update_status", update_status)
+        smart_advice = stats.timed("smart_advice", smart_advice)
+        add_expense = stats.timed("add_expense", add_expense)
+        predict_spending = stats.timed("predict_spending", predict_spending)
+        show_charts = stats.timed("show_charts", show_charts)
+        generate_report = stats.timed("generate_report", generate_report)
+        stats.instrument(VirtualHistory, "refresh")
+        stats.instrument(AnalyticsWindow, "render", "update_trend")
+
+    if options.wallets:
+        # Recently used wallets stay open, so switching back to one is instant
+        wallets = expense_wallets.WalletManager(options.wallets, background=True)
+        wallet_names = wallets.names()
+        wallet_name = wallet_names[0] if wallet_names else expense_wallets.DEFAULT_WALLET
+
+    threading.Thread(target=restore_state, name="restore-state", daemon=True).start()
+    build_window()
+    root.protocol("WM_DELETE_WINDOW", on_close)
+
+    # Built; Tk paints it as soon as the loop starts
+    mark_startup("window")
+    poll_startup()
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Streaming anomaly detection: per-category Welford statistics and log-bucket quantile sketches"""
+import math
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+Z_LIMIT = 3.0       # standard deviations from the category's usual before anything is flagged
+QUANTILE = 0.99     # an unusual expense must also be above this quantile of its category
+SPIKE_RATIO = 2.0   # a spike is at least this many times a usual day, however steady the category
+MIN_SAMPLES = 20    # expenses in a category before any of them is flagged
+MIN_DAYS = 7        # spending days in a category before a day can be a spike
+ACCURACY = 0.02     # relative error of the quantile sketch
+STATE_VERSION = 1
+
+GAMMA = (1 + ACCURACY) / (1 - ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+class RunningStats:
+    """Welford's online mean and variance; two of them merge exactly (Chan et al.)"""
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self, n=0, mean=0.0, m2=0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def merge(self, n, mean, m2):
+        if not n:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.mean += delta * n / total
+        self.n = total
+
+    def std(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    def state(self):
+        return [self.n, self.mean, self.m2]
+
+class QuantileSketch:
+    """Counts in log-spaced buckets, so any quantile is within ACCURACY of the true value.
+
+    Adding is O(1) and the sketch stays small: amounts from ₹1 to ₹10 lakh need
+    fewer than 400 buckets, however many expenses are added.
+    """
+    def __init__(self, buckets=()):
+        self.buckets = dict(buckets)  # bucket index -> count
+        self.count = sum(self.buckets.values())
+
+    def add(self, x, n=1):
+        index = math.ceil(math.log(x) / LOG_GAMMA)
+        self.buckets[index] = self.buckets.get(index, 0) + n
+        self.count += n
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                break
+        # Midpoint of the bucket, in relative terms
+        return 2 * GAMMA ** index / (GAMMA + 1)
+
+    def state(self):
+        return [[index, n] for index, n in sorted(self.buckets.items())]
+
+class CategoryStats:
+    """Everything kept for one category: its expense amounts and its spending days"""
+    def __init__(self, state=None):
+        state = state or {}
+        self.amounts = RunningStats(*state.get("amounts", ()))  # of log amounts; expenses are roughly log-normal
+        self.sketch = QuantileSketch(state.get("buckets", ()))
+        self.daily = RunningStats(*state.get("daily", ()))       # of closed days' totals
+        self.open_day = state.get("open_day")
+        self.day_total = state.get("day_total", 0.0)
+        self.spiked = state.get("spiked", False)
+        self.cutoff = None
+        self.cutoff_count = 0
+
+    def threshold(self):
+        # The quantile walks the buckets, so it is only refreshed as the count grows by 1%
+        if self.cutoff is None or self.sketch.count - self.cutoff_count > self.sketch.count // 100:
+            self.cutoff = self.sketch.quantile(QUANTILE)
+            self.cutoff_count = self.sketch.count
+        return self.cutoff
+
+    def unusual(self, amount):
+        """Distance of amount above the usual, in standard deviations, if it is an outlier"""
+        if self.amounts.n < MIN_SAMPLES:
+            return None
+        excess = math.log(amount) - self.amounts.mean
+        std = self.amounts.std()
+        z = excess / std if std else (math.inf if excess > 0 else 0)
+        if z >= Z_LIMIT and amount > self.threshold():
+            return z
+        return None
+
+    def add_amount(self, amount):
+        self.amounts.add(math.log(amount))
+        self.sketch.add(amount)
+
+    def add_to_day(self, day, amount):
+        """Count amount towards its day; True the first time the open day becomes a spike"""
+        if self.open_day is None or day > self.open_day:
+            if self.open_day is not None:
+                self.daily.add(self.day_total)
+            self.open_day, self.day_total, self.spiked = day, 0.0, False
+        elif day < self.open_day:
+            # Backdated: that day is closed and already counted
+            return False
+        self.day_total += amount
+        if self.spiked or self.daily.n < MIN_DAYS:
+            return False
+        if self.day_total > max(self.daily.mean + Z_LIMIT * self.daily.std(), SPIKE_RATIO * self.daily.mean):
+            self.spiked = True
+            return True
+        return False
+
+    def state(self):
+        return {
+            "amounts": self.amounts.state(),
+            "buckets": self.sketch.state(),
+            "daily": self.daily.state(),
+            "open_day": self.open_day,
+            "day_total": self.day_total,
+            "spiked": self.spiked
+        }
+
+class AnomalyDetector:
+    """Flags unusual expenses and category spending spikes as they are added.
+
+    Each expense updates its category's statistics in O(1), and the whole state is a
+    small JSON-able dict that is saved with the ledger, so loading never rescans history.
+    Days on which a category has no spending are not counted: a spike is measured
+    against the category's usual spending day.
+    """
+    def __init__(self, state=None):
+        self.categories = {}
+        if state and state.get("version") == STATE_VERSION:
+            self.categories = {name: CategoryStats(entry) for name, entry in state["categories"].items()}
+
+    def stats_for(self, category):
+        stats = self.categories.get(category)
+        if stats is None:
+            stats = self.categories[category] = CategoryStats()
+        return stats
+
+    def add(self, day, category, amount, flag=True):
+        """Count one expense (day is an ordinal) and return what it flags; nothing when flag is False"""
+        stats = self.stats_for(category)
+        flags = []
+        z = stats.unusual(amount) if flag else None
+        if z is not None:
+            flags.append({
+                "kind": "expense",
+                "category": category,
+                "date": date.fromordinal(day).isoformat(),
+                "amount": amount,
+                "typical": math.exp(stats.amounts.mean),
+                "z": z
+            })
+        stats.add_amount(amount)
+        if stats.add_to_day(day, amount) and flag:
+            flags.append({
+                "kind": "spike",
+                "category": category,
+                "date": date.fromordinal(day).isoformat(),
+                "amount": stats.day_total,
+                "typical": stats.daily.mean,
+                "z": (stats.day_total - stats.daily.mean) / (stats.daily.std() or 1)
+            })
+        return flags
+
+    def add_store(self, store):
+        """Fold a whole store into the statistics without flagging; call oldest store first"""
+        if not len(store):
+            return
+        if np is not None:
+            codes = np.frombuffer(store.category_codes, dtype=np.uint16)
+            logs = np.log(np.frombuffer(store.amounts, dtype=np.float64))
+            buckets = np.ceil(logs / LOG_GAMMA).astype(np.int64)
+            for code in np.unique(codes):
+                mask = codes == code
+                values = logs[mask]
+                stats = self.stats_for(store.category_names[code])
+                mean = float(values.mean())
+                stats.amounts.merge(len(values), mean, float(((values - mean) ** 2).sum()))
+                for index, n in zip(*np.unique(buckets[mask], return_counts=True)):
+                    stats.sketch.buckets[int(index)] = stats.sketch.buckets.get(int(index), 0) + int(n)
+                    stats.sketch.count += int(n)
+        else:
+            for code, amount in zip(store.category_codes, store.amounts):
+                self.stats_for(store.category_names[code]).add_amount(amount)
+        for (day, category), total in store.day_category_sums().items():
+            self.stats_for(category).add_to_day(day, total)
+
+    def state(self):
+        return {
+            "version": STATE_VERSION,
+            "categories": {name: stats.state() for name, stats in self.categories.items()}
+        }
+
+def format_anomaly(flag):
+    if flag["kind"] == "spike":
+        return (f"📈 {flag['category']} spending spike on {flag['date']}: ₹{round(flag['amount'], 2)} "
+                f"(a usual day is ₹{round(flag['typical'], 2)})")
+    return (f"🔎 Unusual {flag['category']} expense on {flag['date']}: ₹{round(flag['amount'], 2)} "
+            f"(usually about ₹{round(flag['typical'], 2)})")
@@ -0,0 +1,346 @@
+"""Benchmarks for the expense engine and the GUI's ledger-facing functions, run headless.
+
+    python expense_bench.py --sizes 1000 100000 --output bench.json
+
+Each size gets a synthetic ledger on disk. The GUI functions from 14.py run against
+stand-in Tk widgets, and the analytics window renders on matplotlib's Agg canvas, so no
+display is needed. Results are written as sorted, indented JSON so runs can be diffed.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from array import array
+from datetime import date
+
+import expense_anomaly
+import expense_binfmt as binfmt
+import expense_core as core
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SIZES = (10**3, 10**4, 10**5, 10**6, 10**7)
+GUI_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "14.py")
+
+# Share of rows and median amount per category, roughly what a household ledger looks like
+CATEGORY_MIX = {
+    "Food": (0.32, 250),
+    "Travel": (0.14, 400),
+    "Shopping": (0.16, 1200),
+    "Bills": (0.12, 1500),
+    "Entertainment": (0.10, 500),
+    "Other": (0.16, 300),
+}
+AMOUNT_SIGMA = 0.6
+
+# Runs per operation; every operation stops early once it has used MAX_SECONDS
+REPEATS = {
+    "load_data": 5,
+    "save_data": 10,
+    "add_expense": 200,
+    "update_status": 200,
+    "smart_advice": 200,
+    "generate_report": 200,
+    "show_charts": 20,
+    "query": 200,
+    "startup": 5,
+}
+MIN_REPEATS = 3
+MAX_SECONDS = 10.0
+
+# ---------------- SYNTHETIC LEDGER ---------------- #
+def synthetic_store(rows, seed=0):
+    """Store of `rows` expenses spread over the current month so far, with CATEGORY_MIX"""
+    names = list(CATEGORY_MIX)
+    weights = [share for share, _ in CATEGORY_MIX.values()]
+    medians = [median for _, median in CATEGORY_MIX.values()]
+    first = date.today().replace(day=1).toordinal()
+    last = date.today().toordinal()
+
+    store = core.ExpenseStore()
+    for name in names:
+        store.intern(name)
+    if np is not None:
+        rng = np.random.default_rng(seed)
+        codes = rng.choice(len(names), size=rows, p=weights).astype(np.uint16)
+        amounts = np.round(np.array(medians)[codes] * rng.lognormal(0, AMOUNT_SIGMA, rows), 2)
+        days = rng.integers(first, last + 1, size=rows, dtype=np.int32)
+        store.load_columns(amounts.astype(np.float64), codes, np.sort(days), names)
+        return store
+
+    rng = random.Random(seed)
+    codes = rng.choices(range(len(names)), weights=weights, k=rows)
+    store.category_codes = array("H", codes)
+    store.amounts = array("d", (round(medians[c] * rng.lognormvariate(0, AMOUNT_SIGMA), 2) for c in codes))
+    store.days = array("i", sorted(rng.randint(first, last) for _ in range(rows)))
+    return store
+
+def write_ledger(path, rows, seed=0):
+    """Write a binary snapshot of a synthetic ledger with limits that are roughly on budget"""
+    store = synthetic_store(rows, seed)
+    detector = expense_anomaly.AnomalyDetector()
+    detector.add_store(store)
+    monthly_limit = round(sum(store.amounts) * 1.2, 2)
+    settings = {
+        "monthly_limit": monthly_limit,
+        "daily_limit": round(monthly_limit / 30, 2),
+        "streak_start": core.month_start_ordinal(),
+        "journal_gen": 0,
+        "anomalies": detector.state()
+    }
+    with open(path, "wb") as f:
+        binfmt.write_snapshot(f, settings, store)
+
+# ---------------- HEADLESS GUI ---------------- #
+class FakeWidget:
+    """Accepts any Tk call; keeps just enough state for the code paths 14.py exercises"""
+    def __init__(self, *args, **kwargs):
+        self.options = dict(kwargs)
+        self.value = ""
+        self.items = 0
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def config(self, *args, **options):
+        self.options.update(options)
+
+    configure = config
+
+    def cget(self, option):
+        return self.options.get(option, 10)
+
+    def get(self):
+        return self.value
+
+    def set(self, value, *args):
+        self.value = value
+
+    def insert(self, *args, **kwargs):
+        self.items += 1
+        return f"I{self.items}"
+
+    def bbox(self, *args):
+        return ""
+
+    def state(self):
+        return "normal"
+
+    def after(self, ms, callback=None, *args):
+        return "after#0"
+
+def fake_module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+def install_fake_tk():
+    """Put stand-in tkinter and TkAgg modules in sys.modules; the figure still renders with Agg"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    class FigureCanvasTkAgg(FigureCanvasAgg):
+        def __init__(self, figure, master=None):
+            super().__init__(figure)
+
+        def get_tk_widget(self):
+            return FakeWidget()
+
+        def draw_idle(self):
+            # Draw now so the benchmark pays for the render the Tk idle loop would do
+            self.draw()
+
+    widgets = {name: type(name, (FakeWidget,), {}) for name in (
+        "Tk", "Toplevel", "Frame", "Label", "Button", "Entry", "Canvas", "StringVar",
+        "Style", "Combobox", "Progressbar", "Treeview", "Scrollbar")}
+    ttk = fake_module("tkinter.ttk", **widgets)
+    messagebox = fake_module("tkinter.messagebox", **{name: (lambda *args, **kwargs: True) for name in (
+        "showinfo", "showwarning", "showerror", "askyesno")})
+    filedialog = fake_module("tkinter.filedialog", askopenfilename=lambda **kwargs: "",
+                             askdirectory=lambda **kwargs: "")
+    simpledialog = fake_module("tkinter.simpledialog", askstring=lambda *args, **kwargs: None)
+    tkinter = fake_module("tkinter", END="end", ttk=ttk, messagebox=messagebox,
+                          filedialog=filedialog, simpledialog=simpledialog, **widgets)
+    sys.modules.update({
+        "tkinter": tkinter,
+        "tkinter.ttk": ttk,
+        "tkinter.messagebox": messagebox,
+        "tkinter.filedialog": filedialog,
+        "tkinter.simpledialog": simpledialog,
+        "matplotlib.backends.backend_tkagg": fake_module(
+            "matplotlib.backends.backend_tkagg",
+            FigureCanvasTkAgg=FigureCanvasTkAgg,
+            NavigationToolbar2Tk=type("NavigationToolbar2Tk", (FakeWidget,), {}))
+    })
+
+def load_gui(path):
+    """Run 14.py against the ledger at path and return its globals once the ledger is bound
+    to the window; mainloop returns at once"""
+    namespace = {"__name__": "expense_gui_bench", "__file__": GUI_FILE}
+    with open(GUI_FILE, "r", encoding="utf-8") as f:
+        exec(compile(f.read(), GUI_FILE, "exec"), namespace)
+    namespace["main"]([path])
+    # The fake Tk loop never runs the startup poll, so finish restoring here
+    if "interactive" not in namespace["startup_times"]:
+        namespace["restored"].wait()
+        namespace["finish_startup"]()
+    return namespace
+
+# ---------------- MEASUREMENT ---------------- #
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def measure(run, repeats, setup=None):
+    """Time `run` up to `repeats` times, then once more under tracemalloc for its peak memory"""
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < repeats:
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - t0)
+        if len(latencies) >= MIN_REPEATS and time.perf_counter() - started > MAX_SECONDS:
+            break
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        "runs": len(latencies),
+        "ops_per_s": round(len(latencies) / total, 3) if total else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+        "max_ms": round(latencies[-1] * 1000, 4),
+        "peak_kib": round(peak / 1024, 1)
+    }
+
+def bench_startup(path, repeats):
+    """Time from 14.py starting to its window being built, and to it being usable.
+
+    Modules already imported by the benchmark are not imported again, so this
+    slightly understates a cold launch.
+    """
+    window, interactive = [], []
+    for _ in range(repeats):
+        gui = load_gui(path)
+        gui["ledger"].close()
+        window.append(gui["startup_times"]["window"])
+        interactive.append(gui["startup_times"]["interactive"])
+        target = gui["INTERACTIVE_TARGET"]
+    window.sort()
+    interactive.sort()
+    return {
+        "runs": repeats,
+        "window_p50_ms": round(percentile(window, 0.50) * 1000, 4),
+        "interactive_p50_ms": round(percentile(interactive, 0.50) * 1000, 4),
+        "interactive_max_ms": round(interactive[-1] * 1000, 4),
+        "target_ms": target * 1000,
+        "meets_target": percentile(interactive, 0.50) <= target
+    }
+
+def bench_size(rows, directory, seed=0):
+    path = os.path.join(directory, f"bench_{rows}.bin")
+    write_ledger(path, rows, seed)
+    results = {}
+
+    def load():
+        core.Ledger(path).close()
+    results["load_data"] = measure(load, REPEATS["load_data"])
+    results["startup"] = bench_startup(path, REPEATS["startup"])
+
+    gui = load_gui(path)
+    ledger = gui["ledger"]
+    try:
+        def save():
+            ledger.save_data()
+            ledger.persister.flush()
+        results["save_data"] = measure(save, REPEATS["save_data"])
+
+        gui["amount_entry"].value = "125.5"
+        rng = random.Random(seed)
+
+        def pick_category():
+            gui["category_var"].value = rng.choice(core.CATEGORIES)
+
+        def add():
+            gui["add_expense"]()
+            gui["refresh"].run()
+        results["add_expense"] = measure(add, REPEATS["add_expense"], pick_category)
+        ledger.persister.flush()
+
+        for name in ("update_status", "smart_advice", "generate_report"):
+            results[name] = measure(gui[name], REPEATS[name])
+
+        # The index is built by the first query and only extended after that
+        week = date.today().replace(day=1)
+        week_end = week.replace(day=min(7, date.today().day)).isoformat()
+        results["query_first"] = measure(lambda: ledger.query(week.isoformat(), week_end), 1,
+                                         ledger.search.reset)
+        results["query_range"] = measure(lambda: ledger.query(week.isoformat(), week_end), REPEATS["query"])
+        results["query_category"] = measure(lambda: ledger.query(categories=["Food"], min_amount=500),
+                                            REPEATS["query"])
+
+        # The first call builds the window; later ones redraw it after a new expense
+        results["show_charts_first"] = measure(gui["show_charts"], 1)
+        results["show_charts"] = measure(gui["show_charts"], REPEATS["show_charts"],
+                                         lambda: ledger.add_expense(99.0, rng.choice(core.CATEGORIES)))
+    finally:
+        ledger.close()
+        if gui["analytics"] is not None:
+            gui["analytics"].fig.clf()
+    return results
+
+def run(sizes=SIZES, seed=0, directory=None):
+    install_fake_tk()
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__ if np is not None else None,
+            "seed": seed
+        },
+        "results": {}
+    }
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        for rows in sizes:
+            print(f"{rows} rows...", file=sys.stderr)
+            report["results"][str(rows)] = bench_size(rows, tmp, seed)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the expense engine at several ledger sizes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="ledger sizes in rows")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic ledgers")
+    parser.add_argument("--dir", help="where to write the temporary ledgers")
+    parser.add_argument("--output", help="JSON results file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.seed, args.dir)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    sys.exit(main())
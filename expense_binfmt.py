@@ -0,0 +1,116 @@
+"""Compact binary snapshot format for expense ledgers, read through mmap
+
+Layout: a fixed little-endian header, then fixed-width column sections for
+amounts (f64), day ordinals (i32) and category codes (u16) in host byte order
+(little-endian on every platform the app runs on), the per-category totals
+(f64), the category string table and a small JSON settings blob.
+"""
+import json
+import mmap
+import struct
+from datetime import date
+
+MAGIC = b"EXPS"
+VERSION = 1
+
+# magic, version, reserved, rows, categories, total,
+# amounts, days, codes, category totals, category table, settings offsets, settings length
+HEADER = struct.Struct("<4sHHQQd6QQ")
+
+def _align(offset, size=8):
+    return (offset + size - 1) // size * size
+
+def write_snapshot(f, settings, store):
+    """Write settings plus the store's columns; the store only needs its array columns"""
+    rows = len(store.amounts)
+    category_sums = store.category_sums()
+    category_totals = [category_sums.get(name, 0.0) for name in store.category_names]
+    table = b"".join(struct.pack("<H", len(encoded)) + encoded
+                     for encoded in (name.encode("utf-8") for name in store.category_names))
+    settings_blob = json.dumps(settings).encode("utf-8")
+
+    amounts_at = _align(HEADER.size)
+    days_at = amounts_at + 8 * rows
+    codes_at = days_at + 4 * rows
+    totals_at = _align(codes_at + 2 * rows)
+    table_at = totals_at + 8 * len(category_totals)
+    settings_at = table_at + len(table)
+
+    f.write(HEADER.pack(MAGIC, VERSION, 0, rows, len(category_totals), sum(category_totals),
+                        amounts_at, days_at, codes_at, totals_at, table_at, settings_at,
+                        len(settings_blob)))
+    f.write(b"\0" * (amounts_at - HEADER.size))
+    f.write(store.amounts.tobytes())
+    f.write(store.days.tobytes())
+    f.write(store.category_codes.tobytes())
+    f.write(b"\0" * (totals_at - codes_at - 2 * rows))
+    f.write(struct.pack(f"<{len(category_totals)}d", *category_totals))
+    f.write(table)
+    f.write(settings_blob)
+
+class MappedSnapshot:
+    """Read-only view of a binary snapshot; columns are zero-copy memoryviews over the mapping"""
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path} is empty")
+        self.views = []
+        try:
+            self._parse(path)
+        except (ValueError, TypeError, struct.error):
+            self.close()
+            raise ValueError(f"{path} is not a valid expense snapshot")
+
+    def _view(self, start, length, fmt):
+        view = memoryview(self.map)[start:start + length]
+        self.views.append(view)
+        cast = view.cast(fmt)
+        self.views.append(cast)
+        return cast
+
+    def _parse(self, path):
+        (magic, version, _, self.rows, categories, self.total, amounts_at, days_at, codes_at,
+         totals_at, table_at, settings_at, settings_len) = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION or settings_at + settings_len > len(self.map):
+            raise ValueError(path)
+
+        self.amounts = self._view(amounts_at, 8 * self.rows, "d")
+        self.days = self._view(days_at, 4 * self.rows, "i")
+        self.codes = self._view(codes_at, 2 * self.rows, "H")
+        self.category_totals = self._view(totals_at, 8 * categories, "d")
+
+        self.category_names = []
+        offset = table_at
+        for _ in range(categories):
+            (length,) = struct.unpack_from("<H", self.map, offset)
+            self.category_names.append(self.map[offset + 2:offset + 2 + length].decode("utf-8"))
+            offset += 2 + length
+        self.settings = json.loads(self.map[settings_at:settings_at + settings_len])
+
+    def __len__(self):
+        return self.rows
+
+    def row(self, i):
+        """(date, category, amount) for row i, read straight from the mapping"""
+        return (date.fromordinal(self.days[i]).isoformat(),
+                self.category_names[self.codes[i]],
+                self.amounts[i])
+
+    def totals_by_category(self):
+        return dict(zip(self.category_names, self.category_totals))
+
+    def close(self):
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,143 @@
+"""Per-category and per-period budgets with an incremental threshold-alert engine"""
+import calendar
+from datetime import date, timedelta
+
+PERIODS = ("day", "week", "month", "range")
+THRESHOLDS = (0.8, 1.0)
+PERIOD_NAMES = {"day": "daily", "week": "weekly", "month": "monthly", "range": "custom"}
+
+def make_budget(name, limit, category=None, period="month", start=None, end=None):
+    """Validated budget dict, in the form it is stored with the ledger's settings"""
+    name = name.strip()
+    if not name:
+        raise ValueError("Budget needs a name")
+    if limit <= 0:
+        raise ValueError("Budget limit must be positive!")
+    if period not in PERIODS:
+        raise ValueError(f"Budget period must be one of {', '.join(PERIODS)}")
+    if period == "range":
+        if not start or not end:
+            raise ValueError("A custom range budget needs a start and an end date")
+        if date.fromisoformat(start) > date.fromisoformat(end):
+            raise ValueError("Budget range ends before it starts")
+    else:
+        start = end = None
+    return {"name": name, "limit": limit, "category": category, "period": period, "start": start, "end": end}
+
+def period_window(budget, today):
+    """(first, last) day ordinals of the budget's window that contains `today`"""
+    period = budget["period"]
+    if period == "range":
+        return date.fromisoformat(budget["start"]).toordinal(), date.fromisoformat(budget["end"]).toordinal()
+    if period == "day":
+        return today, today
+    day = date.fromordinal(today)
+    if period == "week":
+        first = day - timedelta(days=day.weekday())
+        return first.toordinal(), first.toordinal() + 6
+    last = calendar.monthrange(day.year, day.month)[1]
+    return day.replace(day=1).toordinal(), day.replace(day=last).toordinal()
+
+def level_reached(spent, limit):
+    reached = 0
+    for threshold in THRESHOLDS:
+        if spent >= threshold * limit:
+            reached = threshold
+    return reached
+
+def format_alert(alert):
+    scope = alert["category"] or "Total"
+    icon = "🚨" if alert["threshold"] >= 1 else "⚠️"
+    return (f"{icon} {alert['budget']} ({scope}, {PERIOD_NAMES[alert['period']]}): "
+            f"{round(alert['threshold'] * 100)}% used, ₹{round(alert['spent'], 2)} of ₹{alert['limit']}")
+
+class BudgetTracker:
+    """Running sums for each budget's current window, indexed by category.
+
+    A new expense only visits the budgets for its category plus the all-category ones,
+    and an alert fires only when a sum crosses a threshold, so checking costs
+    O(budgets touched). Windows are reseeded from `window_total(first, last, category)`
+    when a day, week or month rolls over, and at load, where thresholds already
+    passed are marked as fired so a restart does not repeat old alerts.
+    """
+    def __init__(self, budgets, window_total):
+        self.window_total = window_total
+        self.states = {}        # name -> {"budget", "first", "last", "spent", "fired"}
+        self.by_category = {}   # category, or None for all categories -> set of names
+        self.next_roll = None   # earliest window end among recurring budgets
+        today = date.today().toordinal()
+        for budget in budgets:
+            self.add_budget(budget, today)
+
+    def add_budget(self, budget, today=None):
+        self.remove_budget(budget["name"])
+        state = {"budget": budget}
+        self.states[budget["name"]] = state
+        self.by_category.setdefault(budget["category"], set()).add(budget["name"])
+        self.open_window(state, today or date.today().toordinal())
+
+    def remove_budget(self, name):
+        state = self.states.pop(name, None)
+        if state is not None:
+            self.by_category[state["budget"]["category"]].discard(name)
+            self.update_next_roll()
+
+    def open_window(self, state, today):
+        budget = state["budget"]
+        state["first"], state["last"] = period_window(budget, today)
+        state["spent"] = self.window_total(state["first"], state["last"], budget["category"])
+        state["fired"] = level_reached(state["spent"], budget["limit"])
+        self.update_next_roll()
+
+    def update_next_roll(self):
+        ends = [state["last"] for state in self.states.values() if state["budget"]["period"] != "range"]
+        self.next_roll = min(ends) if ends else None
+
+    def roll(self, today=None):
+        """Move recurring budgets whose window has ended onto today's window; O(1) when none has"""
+        today = today or date.today().toordinal()
+        if self.next_roll is None or today <= self.next_roll:
+            return
+        for state in self.states.values():
+            if state["budget"]["period"] != "range" and state["last"] < today:
+                self.open_window(state, today)
+
+    def add(self, day, category, amount):
+        """Count one expense (day is an ordinal) and return the alerts it triggers"""
+        alerts = []
+        for names in (self.by_category.get(category, ()), self.by_category.get(None, ())):
+            for name in names:
+                state = self.states[name]
+                if not state["first"] <= day <= state["last"]:
+                    continue
+                state["spent"] += amount
+                budget = state["budget"]
+                level = level_reached(state["spent"], budget["limit"])
+                if level > state["fired"]:
+                    state["fired"] = level
+                    alerts.append({
+                        "budget": name,
+                        "category": budget["category"],
+                        "period": budget["period"],
+                        "threshold": level,
+                        "spent": state["spent"],
+                        "limit": budget["limit"]
+                    })
+        return alerts
+
+    def status(self):
+        """Current window and usage of every budget, by name"""
+        self.roll()
+        return [
+            {
+                "name": name,
+                "category": state["budget"]["category"],
+                "period": state["budget"]["period"],
+                "first": date.fromordinal(state["first"]).isoformat(),
+                "last": date.fromordinal(state["last"]).isoformat(),
+                "spent": state["spent"],
+                "limit": state["budget"]["limit"],
+                "usage": state["spent"] / state["budget"]["limit"] * 100
+            }
+            for name, state in sorted(self.states.items())
+        ]
@@ -0,0 +1,287 @@
+"""Command-line front end for the expense engine, for scripting and bulk entry"""
+import argparse
+import os
+import sys
+
+import expense_anomaly
+import expense_budgets
+import expense_core as core
+import expense_stats as stats
+import expense_sync
+import expense_wallets
+
+def parse_line(line):
+    """Parse 'amount[,category[,YYYY-MM-DD]]' into an expense dict"""
+    parts = [part.strip() for part in line.split(",")]
+    return {
+        "amount": float(parts[0]),
+        "category": parts[1] if len(parts) > 1 and parts[1] else "Other",
+        "date": parts[2] if len(parts) > 2 and parts[2] else core.today_str()
+    }
+
+def cmd_status(ledger, args):
+    total = ledger.get_total()
+    print(f"Monthly Spent: ₹{total}")
+    print(f"Today Spent: ₹{ledger.get_today_total()}")
+    print(f"Remaining: ₹{max(0, ledger.data['monthly_limit'] - total)}")
+    highest = ledger.top_category()
+    if highest:
+        print(f"Top category: {highest}")
+
+def print_alerts(ledger):
+    for alert in ledger.pop_alerts():
+        print(expense_budgets.format_alert(alert))
+    for flag in ledger.pop_anomalies():
+        print(expense_anomaly.format_anomaly(flag))
+
+def cmd_add(ledger, args):
+    if args.amount is not None:
+        ledger.add_expense(args.amount, args.category, args.date)
+        print_alerts(ledger)
+        return
+
+    # No amount given: read one expense per line from stdin and record them in one batch
+    expenses = [parse_line(line) for line in sys.stdin if line.strip()]
+    ledger.add_expenses(expenses)
+    print(f"Added {len(expenses)} expenses")
+    print_alerts(ledger)
+
+def cmd_history(ledger, args):
+    for month, total in ledger.month_totals().items():
+        print(f"{month}  ₹{round(total,2)}")
+
+def cmd_search(ledger, args):
+    found = ledger.query(args.first, args.last, args.category, args.min, args.max)
+    shown = 0
+    for exp in found.records():
+        if args.limit and shown == args.limit:
+            print(f"... {len(found) - shown} more")
+            break
+        print(f"{exp['date']}  {exp['category']:<14}₹{exp['amount']}")
+        shown += 1
+    print(f"{len(found)} expenses, ₹{round(sum(found.amounts), 2)}")
+
+def cmd_limits(ledger, args):
+    ledger.set_limits(args.monthly, args.daily)
+
+def cmd_budget(ledger, args):
+    if args.action == "set":
+        category = None if args.category == "All" else args.category
+        ledger.set_budget(args.name, args.limit, category, args.period, args.start, args.end)
+    elif args.action == "rm":
+        ledger.remove_budget(args.name)
+    for entry in ledger.budget_status():
+        print(f"{entry['name']}: {entry['category'] or 'All'}, {expense_budgets.PERIOD_NAMES[entry['period']]} "
+              f"{entry['first']}..{entry['last']}  ₹{round(entry['spent'],2)} of ₹{entry['limit']} "
+              f"({entry['usage']:.0f}%)")
+
+def format_forecast(predicted):
+    return f"₹{round(predicted['expected'],2)} (₹{round(predicted['low'],2)} – ₹{round(predicted['high'],2)})"
+
+def cmd_predict(ledger, args):
+    predicted = ledger.predict_spending()
+    if predicted is None:
+        print("Not enough history yet: forecasts start after the first full day", file=sys.stderr)
+        return 1
+    print(f"Estimated End-of-Month Spending: {format_forecast(predicted)}")
+    for category, category_predicted in ledger.category_forecasts().items():
+        print(f"  {category}: {format_forecast(category_predicted)}")
+
+def cmd_backtest(ledger, args):
+    from expense_forecast import backtest, score
+    scores = score(backtest(ledger.daily_history()))
+    if not scores:
+        print("Not enough complete months to backtest", file=sys.stderr)
+        return 1
+    for checkpoint, entry in scores.items():
+        print(f"Day {checkpoint:>2} ({entry['months']} months): "
+              f"error {entry['mape']:.1f}% vs linear {entry['linear_mape']:.1f}%, "
+              f"{entry['coverage']:.0f}% inside the interval")
+
+def cmd_report(ledger, args):
+    report = ledger.generate_report()
+    if report is None:
+        print("Please set monthly limit first!", file=sys.stderr)
+        return 1
+    print(core.format_report(report))
+
+def cmd_reset(ledger, args):
+    if not args.yes:
+        print("Refusing to reset without --yes", file=sys.stderr)
+        return 1
+    ledger.reset_month()
+
+def cmd_import(ledger, args):
+    from expense_import import import_csv
+
+    def report_progress(imported, fraction):
+        print(f"\r{imported} imported ({fraction:.0%})", end="", file=sys.stderr)
+
+    imported, skipped = import_csv(ledger, args.csv_file, args.chunk_rows, args.workers, report_progress)
+    print(file=sys.stderr)
+    print(f"Imported {imported} expenses, skipped {skipped} rows")
+
+def cmd_migrate(ledger, args):
+    from expense_sqlite import migrate_json
+    count = migrate_json(args.file, args.db_file)
+    print(f"Migrated {count} expenses to {args.db_file}")
+
+def cmd_export(ledger, args):
+    count = core.export_json(ledger, args.json_file)
+    print(f"Exported {count} expenses to {args.json_file}")
+
+def wallet_jobs(args, month):
+    """Report jobs for every wallet, opening one ledger at a time"""
+    from expense_reports import build_job
+    manager = expense_wallets.WalletManager(args.wallets_dir)
+    for name in manager.names():
+        wallet = core.open_ledger(manager.path_for(name))
+        try:
+            yield build_job(wallet, month, name, args.out, args.formats)
+        finally:
+            wallet.close()
+
+def cmd_reports(ledger, args):
+    from expense_reports import build_job, run_reports
+    os.makedirs(args.out, exist_ok=True)
+    month = args.month or core.month_str()
+    if args.all_wallets:
+        jobs = wallet_jobs(args, month)
+    else:
+        title = args.wallet or os.path.splitext(os.path.basename(args.file))[0]
+        jobs = [build_job(ledger, month, title, args.out, args.formats)]
+    for result in run_reports(jobs, args.workers):
+        print(f"{result['title']} {result['month']}: {result['rows']} rows, ₹{round(result['total'],2)}")
+        for path in result["files"]:
+            print(f"  {path}")
+
+def cmd_sync(ledger, args):
+    client = args.sync_client or expense_sync.SyncClient(ledger).attach()
+    if args.url:
+        client.url = args.url.rstrip("/")
+        client.save_state()
+    if args.publish_existing:
+        client.publish_existing()
+    try:
+        pushed, pulled = client.sync()
+    except OSError as e:
+        print(f"Sync failed, local expenses stay queued: {e}", file=sys.stderr)
+        return 1
+    print(f"Pushed {pushed} expenses, pulled {pulled} (server at #{client.last_seq})")
+    if client.rejected:
+        print(f"Skipped {client.rejected} unusable remote expenses, see {client.rejects_file}", file=sys.stderr)
+    print_alerts(ledger)
+
+def cmd_wallets(ledger, args):
+    for name in expense_wallets.WalletManager(args.wallets_dir).names():
+        print(name)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Smart Expense Tracker (headless)")
+    parser.add_argument("--file", default=core.DATA_FILE, help="ledger data file (.db for SQLite)")
+    parser.add_argument("--wallet", help="use this wallet instead of --file")
+    parser.add_argument("--wallets-dir", default=expense_wallets.WALLETS_DIR, help="where wallets are kept")
+    parser.add_argument("--stats", action="store_true", help="print call timings to stderr when done")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="show spending totals").set_defaults(func=cmd_status)
+
+    add = commands.add_parser("add", help="add an expense, or many from stdin")
+    add.add_argument("amount", type=float, nargs="?")
+    add.add_argument("--category", default="Other", choices=core.CATEGORIES)
+    add.add_argument("--date", help="YYYY-MM-DD, defaults to today")
+    add.set_defaults(func=cmd_add)
+
+    limits = commands.add_parser("limits", help="set monthly and daily limits")
+    limits.add_argument("monthly", type=float)
+    limits.add_argument("daily", type=float)
+    limits.set_defaults(func=cmd_limits)
+
+    budget = commands.add_parser("budget", help="list budgets, or set / remove one")
+    budget.add_argument("action", nargs="?", default="list", choices=["list", "set", "rm"])
+    budget.add_argument("name", nargs="?", default="")
+    budget.add_argument("limit", type=float, nargs="?", default=0)
+    budget.add_argument("--category", default="All", choices=["All", *core.CATEGORIES])
+    budget.add_argument("--period", default="month", choices=expense_budgets.PERIODS)
+    budget.add_argument("--start", help="YYYY-MM-DD, first day of a range budget")
+    budget.add_argument("--end", help="YYYY-MM-DD, last day of a range budget")
+    budget.set_defaults(func=cmd_budget)
+
+    commands.add_parser("history", help="total spent in each month").set_defaults(func=cmd_history)
+
+    search = commands.add_parser("search", help="list the expenses matching date, category and amount filters")
+    search.add_argument("--from", dest="first", help="YYYY-MM-DD, first day; archived months are searched too")
+    search.add_argument("--to", dest="last", help="YYYY-MM-DD, last day")
+    search.add_argument("--category", nargs="+", choices=core.CATEGORIES, help="one or more categories")
+    search.add_argument("--min", type=float, help="smallest amount")
+    search.add_argument("--max", type=float, help="largest amount")
+    search.add_argument("--limit", type=int, default=50, help="expenses printed (0 prints all)")
+    search.set_defaults(func=cmd_search)
+    commands.add_parser("predict", help="forecast end-of-month spending").set_defaults(func=cmd_predict)
+    commands.add_parser("backtest", help="score the forecasts against past months").set_defaults(func=cmd_backtest)
+    commands.add_parser("report", help="print the monthly report").set_defaults(func=cmd_report)
+
+    reset = commands.add_parser("reset", help="archive this month's expenses, clear limits and streak")
+    reset.add_argument("--yes", action="store_true", help="confirm the reset")
+    reset.set_defaults(func=cmd_reset)
+
+    import_ = commands.add_parser("import", help="import a CSV / bank statement in batches")
+    import_.add_argument("csv_file")
+    import_.add_argument("--chunk-rows", type=int, default=5000, help="rows parsed and committed per batch")
+    import_.add_argument("--workers", type=int, default=0, help="parser processes (0 parses inline)")
+    import_.set_defaults(func=cmd_import)
+
+    export = commands.add_parser("export", help="write every expense and the settings to a JSON file")
+    export.add_argument("json_file")
+    export.set_defaults(func=cmd_export)
+
+    migrate = commands.add_parser("migrate", help="copy the ledger in --file into an SQLite database")
+    migrate.add_argument("db_file")
+    migrate.set_defaults(func=cmd_migrate)
+
+    reports = commands.add_parser("reports", help="write PDF/PNG/CSV month reports on worker processes")
+    reports.add_argument("--month", help="YYYY-MM, defaults to the current month")
+    reports.add_argument("--out", default=".", help="directory for the report files")
+    reports.add_argument("--formats", nargs="+", default=["pdf", "png", "csv"], choices=["pdf", "png", "csv"])
+    reports.add_argument("--all-wallets", action="store_true", help="one report per wallet in --wallets-dir")
+    reports.add_argument("--workers", type=int, default=2, help="report worker processes")
+    reports.set_defaults(func=cmd_reports)
+
+    commands.add_parser("wallets", help="list the wallets in --wallets-dir").set_defaults(func=cmd_wallets)
+
+    sync = commands.add_parser("sync", help="exchange expenses with a sync server (see expense_sync.py)")
+    sync.add_argument("url", nargs="?", help="server URL, remembered for later syncs")
+    sync.add_argument("--publish-existing", action="store_true",
+                      help="also upload every expense already in the ledger; for the first desk only")
+    sync.set_defaults(func=cmd_sync)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.stats or stats.env_enabled():
+        stats.enable()
+        stats.instrument_engine()
+    try:
+        if args.wallet:
+            args.file = expense_wallets.WalletManager(args.wallets_dir).path_for(args.wallet)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    ledger = None if args.command in ("migrate", "wallets") else core.open_ledger(args.file)
+    if ledger is not None and ledger.recovered_from:
+        print(f"Warning: unreadable ledger moved to {ledger.recovered_from}", file=sys.stderr)
+    # A ledger that has been synced before queues every new expense for the next sync
+    args.sync_client = expense_sync.attach(ledger) if ledger is not None else None
+    try:
+        return args.func(ledger, args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if ledger is not None:
+            ledger.close()
+        if stats.enabled:
+            print(stats.summary(), file=sys.stderr)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1000 @@
+"""Headless expense engine: storage, aggregates and limit logic without Tk or matplotlib"""
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, date
+
+import expense_anomaly
+import expense_binfmt as binfmt
+import expense_budgets
+import expense_forecast as forecast
+import expense_search
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DATA_FILE = "expense_data.bin"
+COMPACT_MIN = 500  # journal records before we consider folding them into the snapshot
+
+CATEGORIES = ["Food", "Travel", "Shopping", "Bills", "Entertainment", "Other"]
+SETTINGS = ("monthly_limit", "daily_limit", "streak_start")
+
+def is_binary(path):
+    return path.endswith(".bin")
+
+def journal_file_for(data_file):
+    return os.path.splitext(data_file)[0] + "_journal.jsonl"
+
+def archive_dir_for(data_file):
+    return os.path.splitext(data_file)[0] + "_archive"
+
+def today_str():
+    return datetime.now().strftime("%Y-%m-%d")
+
+def month_str():
+    return datetime.now().strftime("%Y-%m")
+
+def month_start_ordinal():
+    return date.today().replace(day=1).toordinal()
+
+def check_expense(exp):
+    """Raise ValueError unless the expense dict can be recorded as it is.
+    Ledgers check a whole batch this way before adding any of it"""
+    if exp["amount"] <= 0:
+        raise ValueError("Amount must be positive!")
+    if exp["category"] not in CATEGORIES:
+        raise ValueError(f"Unknown category: {exp['category']}")
+    try:
+        valid = date.fromisoformat(exp["date"]).isoformat() == exp["date"]
+    except (TypeError, ValueError):
+        valid = False
+    if not valid:
+        raise ValueError(f"Dates must be YYYY-MM-DD, not {exp['date']!r}")
+
+# ---------------- COLUMNAR EXPENSE STORE ---------------- #
+class ExpenseStore:
+    """Expenses held column-wise: float64 amounts, interned category codes, day ordinals"""
+    def __init__(self):
+        self.amounts = array("d")
+        self.category_codes = array("H")
+        self.days = array("i")
+        self.category_names = []
+        self.category_ids = {}
+        self._day_cache = {}
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def intern(self, category):
+        code = self.category_ids.get(category)
+        if code is None:
+            code = len(self.category_names)
+            self.category_names.append(category)
+            self.category_ids[category] = code
+        return code
+
+    def to_day(self, date_str):
+        # Only a handful of distinct dates per month, so parsing is cached
+        day = self._day_cache.get(date_str)
+        if day is None:
+            day = date.fromisoformat(date_str).toordinal()
+            self._day_cache[date_str] = day
+        return day
+
+    def append(self, amount, category, date_str):
+        self.amounts.append(amount)
+        self.category_codes.append(self.intern(category))
+        self.days.append(self.to_day(date_str))
+
+    def load_columns(self, amounts, category_codes, days, category_names):
+        """Fill an empty store from buffer-backed columns with one memcpy per column"""
+        for column, source in ((self.amounts, amounts), (self.category_codes, category_codes),
+                               (self.days, days)):
+            with memoryview(source).cast("B") as raw:
+                column.frombytes(raw)
+        for name in category_names:
+            self.intern(name)
+
+    def extend(self, expenses):
+        for exp in expenses:
+            self.append(exp["amount"], exp["category"], exp["date"])
+
+    def clear(self):
+        self.__init__()
+
+    def copy(self):
+        """Independent copy of the columns; each array copy is a single memcpy"""
+        other = ExpenseStore()
+        other.amounts = array("d", self.amounts)
+        other.category_codes = array("H", self.category_codes)
+        other.days = array("i", self.days)
+        other.category_names = list(self.category_names)
+        other.category_ids = dict(self.category_ids)
+        return other
+
+    def first_day(self):
+        """Earliest day ordinal in the store, or None when it is empty"""
+        if not self.days:
+            return None
+        if np is not None:
+            return int(np.frombuffer(self.days, dtype=np.int32).min())
+        return min(self.days)
+
+    def row(self, i):
+        return (date.fromordinal(self.days[i]).isoformat(),
+                self.category_names[self.category_codes[i]],
+                self.amounts[i])
+
+    def records(self):
+        for i in range(len(self)):
+            day, category, amount = self.row(i)
+            yield {"amount": amount, "category": category, "date": day}
+
+    def category_sums(self):
+        if not self.amounts:
+            return {}
+        if np is not None:
+            codes = np.frombuffer(self.category_codes, dtype=np.uint16)
+            amounts = np.frombuffer(self.amounts, dtype=np.float64)
+            sums = np.bincount(codes, weights=amounts, minlength=len(self.category_names))
+            counts = np.bincount(codes, minlength=len(self.category_names))
+            return {self.category_names[c]: float(sums[c]) for c in np.flatnonzero(counts)}
+        sums = {}
+        for code, amount in zip(self.category_codes, self.amounts):
+            sums[code] = sums.get(code, 0) + amount
+        return {self.category_names[c]: total for c, total in sums.items()}
+
+    def date_sums(self):
+        if not self.amounts:
+            return {}
+        if np is not None:
+            days = np.frombuffer(self.days, dtype=np.int32)
+            amounts = np.frombuffer(self.amounts, dtype=np.float64)
+            first = int(days.min())
+            sums = np.bincount(days - first, weights=amounts)
+            counts = np.bincount(days - first)
+            return {date.fromordinal(first + int(d)).isoformat(): float(sums[d])
+                    for d in np.flatnonzero(counts)}
+        sums = {}
+        for day, amount in zip(self.days, self.amounts):
+            sums[day] = sums.get(day, 0) + amount
+        return {date.fromordinal(d).isoformat(): total for d, total in sums.items()}
+
+    def between(self, first, last):
+        """New store with the rows whose day ordinal lies in first..last"""
+        other = ExpenseStore()
+        if np is not None and self.amounts:
+            days = np.frombuffer(self.days, dtype=np.int32)
+            mask = (days >= first) & (days <= last)
+            other.load_columns(np.frombuffer(self.amounts, dtype=np.float64)[mask],
+                               np.frombuffer(self.category_codes, dtype=np.uint16)[mask],
+                               days[mask], self.category_names)
+            return other
+        for i, day in enumerate(self.days):
+            if first <= day <= last:
+                other.append(self.amounts[i], self.category_names[self.category_codes[i]],
+                             date.fromordinal(day).isoformat())
+        return other
+
+    def day_category_sums(self):
+        """Totals per (day ordinal, category), in day order"""
+        if np is not None and self.amounts:
+            days = np.frombuffer(self.days, dtype=np.int32)
+            width = len(self.category_names)
+            first = int(days.min())
+            keys = (days - first).astype(np.int64) * width + np.frombuffer(self.category_codes, dtype=np.uint16)
+            sums = np.bincount(keys, weights=np.frombuffer(self.amounts, dtype=np.float64))
+            counts = np.bincount(keys)
+            return {(first + int(k) // width, self.category_names[int(k) % width]): float(sums[k])
+                    for k in np.flatnonzero(counts)}
+        sums = {}
+        for day, code, amount in zip(self.days, self.category_codes, self.amounts):
+            key = (day, code)
+            sums[key] = sums.get(key, 0) + amount
+        return {(day, self.category_names[code]): total for (day, code), total in sorted(sums.items())}
+
+# ---------------- PERSISTENCE ---------------- #
+def fsync_dir(path):
+    """Make a rename in path's directory durable, where the platform allows it"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def write_atomic(path, write, mode="w"):
+    """Write through a temp file and swap it in, so readers see the old or new file, never half of one"""
+    tmp_file = path + ".tmp"
+    with open(tmp_file, mode) as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+    fsync_dir(path)
+
+class Persister:
+    """Performs a ledger's disk writes, either inline or on a write-behind thread that coalesces them.
+
+    A write that fails is put back in the queue and retried, after RETRY_SECONDS on the
+    thread; the error is kept for pop_error() or raised by flush() and close().
+    """
+    RETRY_SECONDS = 2.0
+
+    def __init__(self, data_file, journal_file, background=False):
+        self.data_file = data_file
+        self.journal_file = journal_file
+        self.cond = threading.Condition()
+        self.jobs = []        # other writes, such as archive partitions, run before the snapshot
+        self.snapshot = None  # (data, store) of the newest snapshot not yet written
+        self.records = []     # journal records not yet written, oldest first
+        self.busy = False
+        self.closed = False
+        self.error = None
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self.run, name="expense-persister", daemon=True)
+            self.thread.start()
+
+    def submit_snapshot(self, data, store):
+        with self.cond:
+            # A newer snapshot supersedes any older one and every record it already contains
+            self.snapshot = (data, store)
+            self.records = []
+            self.cond.notify_all()
+        if self.thread is None:
+            self.write_pending()
+
+    def submit_job(self, write):
+        """Queue write() to run ahead of the next snapshot; a snapshot never supersedes it"""
+        with self.cond:
+            self.jobs.append(write)
+            self.cond.notify_all()
+        if self.thread is None:
+            self.write_pending()
+
+    def submit_records(self, gen, expenses):
+        with self.cond:
+            self.records.extend({"gen": gen, "expense": exp} for exp in expenses)
+            self.cond.notify_all()
+        if self.thread is None:
+            self.write_pending()
+
+    def write_pending(self):
+        with self.cond:
+            jobs, snapshot, records = self.jobs, self.snapshot, self.records
+            self.jobs, self.snapshot, self.records = [], None, []
+            self.busy = True
+        try:
+            while jobs:
+                jobs[0]()
+                jobs.pop(0)
+            if snapshot is not None:
+                data, store = snapshot
+                if is_binary(self.data_file):
+                    write_atomic(self.data_file, lambda f: binfmt.write_snapshot(f, data, store), "wb")
+                else:
+                    write_atomic(self.data_file,
+                                 lambda f: json.dump(dict(data, expenses=list(store.records())), f))
+                snapshot = None
+                # Older-generation lines are already ignored on replay; truncating reclaims the space
+                open(self.journal_file, "w").close()
+            if records:
+                self.append_records(records)
+                records = []
+        except Exception as e:
+            with self.cond:
+                self.error = e
+                self.jobs = jobs + self.jobs
+                # Requeue what was not written, unless a newer snapshot has superseded it
+                if self.snapshot is None:
+                    self.snapshot = snapshot
+                    self.records = records + self.records
+            raise
+        finally:
+            with self.cond:
+                self.busy = False
+                self.cond.notify_all()
+
+    def append_records(self, records):
+        """Append records to the journal, all or nothing: a failed append is cut back off,
+        so its retry neither duplicates records nor lands on a partial line"""
+        start = os.path.getsize(self.journal_file) if os.path.isfile(self.journal_file) else 0
+        try:
+            with open(self.journal_file, "a") as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception:
+            if os.path.isfile(self.journal_file):
+                os.truncate(self.journal_file, start)
+            raise
+
+    def pending(self):
+        return self.snapshot is not None or bool(self.records) or bool(self.jobs)
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending() and not self.closed:
+                    self.cond.wait()
+                if self.closed and not self.pending():
+                    return
+            try:
+                self.write_pending()
+            except Exception:
+                with self.cond:
+                    # A ledger being closed gets one last attempt; the error is then raised by close()
+                    if self.closed:
+                        return
+                    self.cond.wait(self.RETRY_SECONDS)
+
+    def pop_error(self):
+        """The last write error not yet reported, if any; the writes themselves are still retried"""
+        with self.cond:
+            error, self.error = self.error, None
+        return error
+
+    def flush(self):
+        """Block until everything submitted so far is on disk, or raise the error that stopped it"""
+        if self.thread is not None:
+            with self.cond:
+                while (self.pending() or self.busy) and self.error is None:
+                    self.cond.wait()
+        error = self.pop_error()
+        if error is not None:
+            raise error
+
+    def close(self):
+        if self.thread is not None:
+            with self.cond:
+                self.closed = True
+                self.cond.notify_all()
+            self.thread.join()
+        self.flush()
+
+# ---------------- MONTH ARCHIVE ---------------- #
+def summarize(store):
+    return {
+        "total": sum(store.amounts),
+        "count": len(store),
+        "by_category": store.category_sums(),
+        "by_date": store.date_sums()
+    }
+
+class MonthArchive:
+    """Closed months as read-only per-month partition files, plus a small index of their summaries"""
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_file = os.path.join(directory, "months.json")
+        self.summaries = {}
+        self.unwritten = {}  # month -> store of partitions handed to the persister but not yet on disk
+        self.scanned = {}  # month -> store read by a search, kept since partitions never change in place
+        self.recovered_from = None
+        # Journal generation and last month of the most recent roll-over, for crash recovery
+        self.rolled_gen = 0
+        self.rolled_through = ""
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, "r") as f:
+                    saved = json.load(f)
+                self.summaries = saved["months"]
+                self.rolled_gen = saved["rolled_gen"]
+                self.rolled_through = saved["rolled_through"]
+            except (ValueError, KeyError, TypeError):
+                # Like a damaged snapshot: keep it for inspection; the partitions themselves are intact
+                self.recovered_from = self.index_file + ".corrupt"
+                os.replace(self.index_file, self.recovered_from)
+                self.summarize_partitions()
+
+    def summarize_partitions(self):
+        """Rebuild the summaries from the partition files, for when the index is lost"""
+        self.summaries, self.rolled_gen, self.rolled_through = {}, 0, ""
+        for name in sorted(os.listdir(self.directory)):
+            month, ext = os.path.splitext(name)
+            if ext in (".bin", ".json") and name != "months.json" and month not in self.summaries:
+                try:
+                    self.summaries[month] = summarize(self.read_partition(month))
+                except ValueError:
+                    pass
+        write_atomic(self.index_file, lambda f: json.dump({
+            "months": self.summaries,
+            "rolled_gen": self.rolled_gen,
+            "rolled_through": self.rolled_through
+        }, f))
+
+    def months(self):
+        return sorted(self.summaries)
+
+    def partition_file(self, month):
+        return os.path.join(self.directory, month + ".bin")
+
+    def load_month(self, month):
+        """Read a single closed month into its own store; no other partition is touched"""
+        if month not in self.summaries:
+            return ExpenseStore()
+        unwritten = self.unwritten.get(month)  # the persister thread removes entries once written
+        if unwritten is not None:
+            return unwritten.copy()
+        return self.read_partition(month)
+
+    def partition(self, month):
+        """A closed month's store for reading only; read from disk once, then served from memory"""
+        store = self.unwritten.get(month)
+        if store is None:
+            store = self.scanned.get(month)
+        if store is None:
+            store = self.scanned[month] = self.load_month(month)
+        return store
+
+    def may_match(self, month, first=None, last=None, categories=None):
+        """Whether a closed month can hold any expense on a day in first..last (ISO dates)
+        in one of the categories, judged from its summary without reading the partition"""
+        summary = self.summaries[month]
+        if categories is not None and not any(category in summary["by_category"] for category in categories):
+            return False
+        return any((not first or first <= day) and (not last or day <= last) for day in summary["by_date"])
+
+    def read_partition(self, month):
+        store = ExpenseStore()
+        legacy_file = os.path.join(self.directory, month + ".json")
+        if os.path.exists(legacy_file) and not os.path.exists(self.partition_file(month)):
+            with open(legacy_file, "r") as f:
+                store.extend(json.load(f))
+            return store
+        with binfmt.MappedSnapshot(self.partition_file(month)) as partition:
+            store.load_columns(partition.amounts, partition.codes, partition.days, partition.category_names)
+        return store
+
+    def close_months(self, partitions, rolled_gen, rolled_through):
+        """Archive {month: [expense, ...]} in memory, merging into months that were already closed.
+        Returns the function that writes the partitions and the index, for the persister to run"""
+        stores = {}
+        for month, expenses in partitions.items():
+            store = self.load_month(month)
+            store.extend(expenses)
+            stores[month] = store
+            self.summaries[month] = summarize(store)
+            self.scanned.pop(month, None)
+        self.unwritten.update(stores)
+        self.rolled_gen = rolled_gen
+        self.rolled_through = rolled_through
+        index = {"months": dict(self.summaries), "rolled_gen": rolled_gen, "rolled_through": rolled_through}
+
+        def write():
+            os.makedirs(self.directory, exist_ok=True)
+            for month, store in stores.items():
+                write_atomic(self.partition_file(month),
+                             lambda f: binfmt.write_snapshot(f, {"month": month}, store), "wb")
+            write_atomic(self.index_file, lambda f: json.dump(index, f))
+            for month, store in stores.items():
+                # A later roll-over may already have replaced it with a bigger store
+                if self.unwritten.get(month) is store:
+                    del self.unwritten[month]
+        return write
+
+# ---------------- LEDGER ---------------- #
+class Ledger:
+    """One expense ledger: the open month as a snapshot plus an append-only journal,
+    closed months in a read-only archive, and running totals over the open month"""
+    def __init__(self, data_file=DATA_FILE, background=False):
+        self.data_file = data_file
+        self.journal_file = journal_file_for(data_file)
+        self.persister = Persister(data_file, self.journal_file, background)
+        self.archive = MonthArchive(archive_dir_for(data_file))
+        self.current_month = month_str()
+        self.recovered_from = self.archive.recovered_from
+        self.journal_count = 0
+        self.store = ExpenseStore()
+        self.search = expense_search.ExpenseIndex(self.store)  # built on the first query
+        self.index = {}
+        self.forecaster = None
+        self.over_days = []  # sorted ordinals of days that went over the daily limit
+        self.best_closed_streak = None
+        self.budget_tracker = None
+        self.alerts = []  # budget alerts not yet shown
+        self.detector = None
+        self.anomalies = []  # flagged expenses and spikes not yet shown
+        self.observers = []  # called with each batch of new expenses, e.g. by expense_sync
+        self.version = 0  # bumped on every change so views can skip redundant redraws
+        self.replaced = 0  # bumped when the open rows are replaced rather than appended to
+        self.data = self.load_data()
+
+    # -------- FILE STORAGE -------- #
+    def load_data(self):
+        self.store.clear()
+        loaded = self.read_snapshot()
+        if loaded is None:
+            loaded = {
+                "monthly_limit": 0,
+                "daily_limit": 0
+            }
+        loaded.setdefault("journal_gen", 0)
+        # Older ledgers stored a refresh counter instead; count from the start of the month
+        loaded.pop("streak", None)
+        loaded.setdefault("streak_start", month_start_ordinal())
+        loaded.setdefault("budgets", [])
+
+        journaled = []
+        self.journal_count = self.replay_journal(loaded["journal_gen"], journaled)
+        self.store.extend(journaled)
+
+        if self.archive.rolled_gen > loaded["journal_gen"]:
+            # The last roll-over reached the archive but not the snapshot; its rows are already archived
+            kept = [exp for exp in self.store.records() if exp["date"][:7] > self.archive.rolled_through]
+            self.store.clear()
+            self.store.extend(kept)
+
+        self.data = loaded
+        self.load_detector(loaded.get("anomalies"), journaled)
+        self.rebuild_index()
+        self.seed_forecast()
+        self.rebuild_streaks()
+        self.budget_tracker = expense_budgets.BudgetTracker(loaded["budgets"], self.window_total)
+        self.version += 1
+        self.replaced += 1
+        self.roll_over()
+        return loaded
+
+    def read_snapshot(self):
+        """Load the snapshot's rows into the store and return its settings, or None if there is none"""
+        path = self.data_file
+        if is_binary(path) and not os.path.exists(path):
+            # Ledgers saved before the binary format still have a JSON snapshot next to it
+            path = os.path.splitext(path)[0] + ".json"
+        if not os.path.exists(path):
+            return None
+
+        try:
+            if is_binary(path):
+                with binfmt.MappedSnapshot(path) as snapshot:
+                    self.store.load_columns(snapshot.amounts, snapshot.codes, snapshot.days,
+                                            snapshot.category_names)
+                    return dict(snapshot.settings)
+            with open(path, "r") as f:
+                loaded = json.load(f)
+            self.store.extend(loaded.pop("expenses"))
+            return loaded
+        except ValueError:
+            # Snapshots are only ever swapped in whole, so this is damage from outside
+            # the app; keep the file for inspection instead of overwriting it on next save
+            self.store.clear()
+            self.recovered_from = path + ".corrupt"
+            os.replace(path, self.recovered_from)
+            return None
+
+    def replay_journal(self, gen, expenses):
+        """Collect journaled expenses of the snapshot's generation and drop a torn tail"""
+        if not os.path.exists(self.journal_file):
+            return 0
+
+        count = 0
+        good_bytes = 0
+        with open(self.journal_file, "rb+") as f:
+            for line in f:
+                # A crash mid-append leaves a partial last line; everything before it is intact
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                good_bytes += len(line)
+                # Records from an older generation are already folded into the snapshot
+                if record.get("gen") == gen:
+                    expenses.append(record["expense"])
+                    count += 1
+            f.truncate(good_bytes)
+        return count
+
+    def save_data(self):
+        """Hand a full snapshot to the persister and start a new, empty journal generation"""
+        self.data["journal_gen"] += 1
+        self.data["anomalies"] = self.detector.state()
+        self.persister.submit_snapshot(dict(self.data), self.store.copy())
+        self.journal_count = 0
+
+    def append_journal(self, expenses):
+        """Journal new expenses; the write cost does not depend on ledger size"""
+        self.persister.submit_records(self.data["journal_gen"], expenses)
+        self.journal_count += len(expenses)
+
+        # Compacting only once the journal is as long as the snapshot keeps the
+        # amortized cost per entry constant
+        if self.journal_count >= max(COMPACT_MIN, len(self.store)):
+            self.save_data()
+
+    def roll_over(self, include_current=False):
+        """Move closed months (or everything, on a reset) from the hot store into the archive"""
+        self.current_month = month_str()
+        # The common case, nothing from an earlier month, is answered without walking the rows
+        first = self.store.first_day()
+        if first is None or (not include_current and first >= month_start_ordinal()):
+            return False
+        keep = []
+        partitions = {}
+        for exp in self.store.records():
+            month = exp["date"][:7]
+            if include_current or month < self.current_month:
+                partitions.setdefault(month, []).append(exp)
+            else:
+                keep.append(exp)
+        if not partitions:
+            return False
+
+        # Archive first, on the persister too: if the snapshot below never lands,
+        # load_data() drops the duplicates
+        self.persister.submit_job(self.archive.close_months(partitions, self.data["journal_gen"] + 1,
+                                                            max(partitions)))
+        self.store.clear()
+        self.store.extend(keep)
+        self.rebuild_index()
+        self.version += 1
+        self.replaced += 1
+        self.save_data()
+        return True
+
+    # -------- AGGREGATE INDEX -------- #
+    # Running totals kept in step with the expense store so status refreshes never rescan it
+    def clear_index(self):
+        self.index["total"] = 0
+        self.index["by_month"] = {}
+        self.index["by_date"] = {}
+        self.index["by_category"] = {}
+
+    def index_expense(self, exp):
+        index = self.index
+        amount = exp["amount"]
+        month = exp["date"][:7]
+        index["total"] += amount
+        index["by_month"][month] = index["by_month"].get(month, 0) + amount
+        index["by_date"][exp["date"]] = index["by_date"].get(exp["date"], 0) + amount
+        index["by_category"][exp["category"]] = index["by_category"].get(exp["category"], 0) + amount
+
+    def rebuild_index(self):
+        """Seed the index from the store with one vectorized group-by per dimension"""
+        self.clear_index()
+        self.search.reset()
+        index = self.index
+        index["by_date"] = self.store.date_sums()
+        index["by_category"] = self.store.category_sums()
+        for day, amount in index["by_date"].items():
+            index["by_month"][day[:7]] = index["by_month"].get(day[:7], 0) + amount
+        index["total"] = sum(index["by_month"].values())
+
+    def seed_forecast(self):
+        """Feed the forecaster its rolling window: the recent archived months and the open store"""
+        self.forecaster = forecast.Forecaster()
+        oldest = date.today().toordinal() - forecast.WINDOW_DAYS
+        oldest_month = date.fromordinal(oldest).strftime("%Y-%m")
+        stores = [self.archive.load_month(month) for month in self.archive.months() if month >= oldest_month]
+        for store in stores + [self.store]:
+            for (day, category), amount in store.day_category_sums().items():
+                if day >= oldest:
+                    self.forecaster.add(day, category, amount)
+
+    # -------- ANOMALIES -------- #
+    def load_detector(self, state, journaled):
+        """Restore the saved anomaly statistics and add the journaled rows; only a ledger
+        saved before they existed is scanned, once, to build them"""
+        if state is None:
+            self.detector = expense_anomaly.AnomalyDetector()
+            for month in self.archive.months():
+                self.detector.add_store(self.archive.load_month(month))
+            self.detector.add_store(self.store)
+            return
+        self.detector = expense_anomaly.AnomalyDetector(state)
+        for exp in journaled:
+            self.detector.add(self.store.to_day(exp["date"]), exp["category"], exp["amount"], flag=False)
+
+    def pop_anomalies(self):
+        """Unusual expenses and spending spikes flagged since the last call, oldest first"""
+        anomalies, self.anomalies = self.anomalies, []
+        return anomalies
+
+    # -------- EXPENSES AND LIMITS -------- #
+    def add_expenses(self, expenses):
+        """Record a batch of expense dicts with a single journal write"""
+        if month_str() != self.current_month:
+            self.roll_over()
+        for exp in expenses:
+            check_expense(exp)
+        # Reseeding a rolled-over budget window reads the ledger, so it happens before the batch lands
+        self.budget_tracker.roll()
+        for exp in expenses:
+            self.store.append(exp["amount"], exp["category"], exp["date"])
+            self.index_expense(exp)
+            self.forecaster.add(self.store.days[-1], exp["category"], exp["amount"])
+            self.alerts.extend(self.budget_tracker.add(self.store.days[-1], exp["category"], exp["amount"]))
+            self.anomalies.extend(self.detector.add(self.store.days[-1], exp["category"], exp["amount"]))
+        self.track_streak({exp["date"] for exp in expenses})
+        self.version += 1
+        self.append_journal(expenses)
+        for observer in self.observers:
+            observer(expenses)
+
+    def add_expense(self, amount, category, day=None):
+        expense = {
+            "amount": amount,
+            "category": category,
+            "date": day or today_str()
+        }
+        self.add_expenses([expense])
+        return expense
+
+    def set_limits(self, monthly_limit, daily_limit):
+        self.data["monthly_limit"] = monthly_limit
+        if daily_limit != self.data["daily_limit"]:
+            # Days under the old limit say nothing about the new one
+            self.data["daily_limit"] = daily_limit
+            self.data["streak_start"] = date.today().toordinal()
+            self.rebuild_streaks()
+        self.save_data()
+
+    def reset_month(self):
+        """Start a new month: archive every open expense and clear limits and streak"""
+        self.data["monthly_limit"] = 0
+        self.data["daily_limit"] = 0
+        self.data["streak_start"] = date.today().toordinal()
+        self.rebuild_streaks()
+        if not self.roll_over(include_current=True):
+            self.save_data()
+
+    # -------- BUDGETS -------- #
+    def set_budget(self, name, limit, category=None, period="month", start=None, end=None):
+        """Add or replace a budget; category None covers every category"""
+        if category is not None and category not in CATEGORIES:
+            raise ValueError(f"Unknown category: {category}")
+        budget = expense_budgets.make_budget(name, limit, category, period, start, end)
+        self.data["budgets"] = [b for b in self.data["budgets"] if b["name"] != budget["name"]] + [budget]
+        self.budget_tracker.add_budget(budget)
+        self.version += 1
+        self.save_data()
+        return budget
+
+    def remove_budget(self, name):
+        if not any(b["name"] == name for b in self.data["budgets"]):
+            raise ValueError(f"No budget named {name!r}")
+        self.data["budgets"] = [b for b in self.data["budgets"] if b["name"] != name]
+        self.budget_tracker.remove_budget(name)
+        self.version += 1
+        self.save_data()
+
+    def budget_status(self):
+        return self.budget_tracker.status()
+
+    def pop_alerts(self):
+        """Budget threshold crossings since the last call, oldest first"""
+        alerts, self.alerts = self.alerts, []
+        return alerts
+
+    def window_total(self, first, last, category=None):
+        """Spent between two day ordinals, for one category or all; reads only the months in range"""
+        stores = []
+        month = date.fromordinal(first).replace(day=1)
+        while month.toordinal() <= last:
+            if month.strftime("%Y-%m") in self.archive.summaries:
+                stores.append(self.archive.load_month(month.strftime("%Y-%m")).between(first, last))
+            month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        stores.append(self.store.between(first, last))
+        if category is None:
+            return sum(sum(store.amounts) for store in stores)
+        return sum(store.category_sums().get(category, 0) for store in stores)
+
+    # -------- QUERIES -------- #
+    def get_total(self):
+        return self.index["by_month"].get(month_str(), 0)
+
+    def get_today_total(self):
+        return self.index["by_date"].get(today_str(), 0)
+
+    def category_totals(self):
+        return self.index["by_category"]
+
+    def date_totals(self):
+        return self.index["by_date"]
+
+    def month_totals(self):
+        """Total per month across archived and open partitions, from summaries alone"""
+        totals = {month: summary["total"] for month, summary in self.archive.summaries.items()}
+        for month, total in self.index["by_month"].items():
+            totals[month] = totals.get(month, 0) + total
+        return dict(sorted(totals.items()))
+
+    def load_month(self, month):
+        """Store holding one month's expenses; reads only that month's archive partition"""
+        first = date.fromisoformat(month + "-01")
+        last = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+        hot = self.store.between(first.toordinal(), last.toordinal() - 1)
+        store = self.archive.load_month(month)
+        if not len(store):
+            return hot
+        store.extend(hot.records())
+        return store
+
+    def query(self, first=None, last=None, categories=None, min_amount=None, max_amount=None):
+        """Expenses matching every filter given, in date order, as a new store.
+
+        first and last are ISO dates. The open store is searched through its date index
+        and category posting lists. Archived months in the range are skipped when their
+        summary rules out a match, and the ones scanned stay cached for the next query.
+        """
+        first_day = date.fromisoformat(first).toordinal() if first else None
+        last_day = date.fromisoformat(last).toordinal() if last else None
+        parts = []
+        for month in self.archive.months():
+            if (not last or month <= last[:7]) and self.archive.may_match(month, first, last, categories):
+                parts.append(expense_search.scan(self.archive.partition(month), first_day, last_day,
+                                                 categories, min_amount, max_amount))
+        rows = self.search.rows(first_day, last_day, categories)
+        parts.append(expense_search.take(self.store, rows, min_amount, max_amount))
+        return expense_search.concat(parts)
+
+    def query_added(self, start, first=None, last=None, categories=None, min_amount=None, max_amount=None):
+        """query() over just the open rows from row start on, for views that hold the earlier matches"""
+        first_day = date.fromisoformat(first).toordinal() if first else None
+        last_day = date.fromisoformat(last).toordinal() if last else None
+        added = expense_search.take(self.store, range(start, len(self.store)))
+        return expense_search.scan(added, first_day, last_day, categories, min_amount, max_amount)
+
+    def top_category(self):
+        category_totals = self.index["by_category"]
+        if not category_totals:
+            return None
+        return max(category_totals, key=category_totals.get)
+
+    # -------- STREAKS -------- #
+    # A streak is a run of calendar days since streak_start that stayed within the daily
+    # limit. Only the days that went over are kept, so adding expenses checks just the
+    # dates they touch and a query is a binary search.
+    def day_total(self, day):
+        """Total for one date, archived months included"""
+        archived = self.archive.summaries.get(day[:7], {}).get("by_date", {}).get(day, 0)
+        return archived + self.index["by_date"].get(day, 0)
+
+    def rebuild_streaks(self):
+        """Find the over-limit days from the per-date totals; used at load and on limit changes"""
+        limit = self.data["daily_limit"]
+        start = self.data["streak_start"]
+        self.over_days = []
+        if limit > 0:
+            self.over_days = sorted(
+                ordinal for ordinal in (date.fromisoformat(day).toordinal()
+                                        for day, total in self.daily_history().items() if total > limit)
+                if ordinal >= start
+            )
+        self.best_closed_streak = None
+
+    def track_streak(self, days):
+        """Mark any of the given dates that have just gone over the daily limit"""
+        limit = self.data["daily_limit"]
+        if limit <= 0:
+            return
+        for day in days:
+            ordinal = date.fromisoformat(day).toordinal()
+            if ordinal < self.data["streak_start"]:
+                continue
+            i = bisect_left(self.over_days, ordinal)
+            if i < len(self.over_days) and self.over_days[i] == ordinal:
+                continue
+            if self.day_total(day) > limit:
+                insort(self.over_days, ordinal)
+                self.best_closed_streak = None
+
+    def streaks(self):
+        """Current and longest runs of days within the daily limit, today included if it is so far"""
+        if self.data["daily_limit"] <= 0:
+            return {"current": 0, "longest": 0}
+        today = date.today().toordinal()
+        start = self.data["streak_start"]
+        past = bisect_right(self.over_days, today)
+
+        if past and self.over_days[past - 1] == today:
+            current = 0
+        else:
+            current = today - (self.over_days[past - 1] if past else start - 1)
+
+        if self.best_closed_streak is None:
+            best = 0
+            previous = start - 1
+            for day in self.over_days[:past]:
+                best = max(best, day - previous - 1)
+                previous = day
+            self.best_closed_streak = best
+        return {"current": current, "longest": max(self.best_closed_streak, current)}
+
+    def daily_history(self):
+        """Per-date totals over the whole ledger, archived months included"""
+        totals = {}
+        for month in self.archive.months():
+            totals.update(self.archive.summaries[month]["by_date"])
+        for day, total in self.index["by_date"].items():
+            totals[day] = totals.get(day, 0) + total
+        return totals
+
+    def predict_spending(self, category=None):
+        """End-of-month forecast {"expected", "low", "high"} for all spending or one category,
+        or None until there is a full day of history"""
+        return self.forecaster.month_forecast(date.today().toordinal(), category)
+
+    def category_forecasts(self):
+        forecasts = {}
+        for category in self.forecaster.categories():
+            predicted = self.predict_spending(category)
+            if predicted is not None:
+                forecasts[category] = predicted
+        return forecasts
+
+    def generate_report(self):
+        """Monthly usage summary, or None when no monthly limit is set"""
+        return build_report(self.get_total(), self.data["monthly_limit"])
+
+    def pop_write_error(self):
+        """A failed disk write not yet shown to the user; the data stays queued and is retried"""
+        return self.persister.pop_error()
+
+    def close(self):
+        """Flush pending writes and stop the write-behind thread, if any"""
+        self.persister.close()
+
+def export_json(ledger, path):
+    """Write the whole ledger, archived months included, as one JSON document"""
+    expenses = []
+    for month in ledger.month_totals():
+        expenses.extend(ledger.load_month(month).records())
+    settings = {key: ledger.data[key] for key in SETTINGS}
+    settings["budgets"] = ledger.data["budgets"]
+    write_atomic(path, lambda f: json.dump(dict(settings, expenses=expenses), f))
+    return len(expenses)
+
+def open_ledger(path=DATA_FILE, background=False):
+    """Open a file ledger, or an SQLite one for .db/.sqlite paths"""
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        from expense_sqlite import SqliteLedger
+        return SqliteLedger(path)
+    return Ledger(path, background)
+
+def build_report(total, limit_amt):
+    """Usage summary for a month's total against its limit, or None without a limit"""
+    if limit_amt == 0:
+        return None
+
+    usage = (total / limit_amt) * 100
+    score = max(0, 100 - usage)
+
+    if usage <= 50:
+        status = "🏆 Excellent"
+    elif usage <= 80:
+        status = "👍 Good"
+    elif usage <= 100:
+        status = "⚠️ Risk Zone"
+    else:
+        status = "🚨 Critical"
+
+    return {
+        "total": total,
+        "limit": limit_amt,
+        "usage": usage,
+        "score": score,
+        "status": status
+    }
+
+def format_report(report):
+    return f"""
+📊 MONTHLY REPORT
+-------------------------
+Total Spent: ₹{report["total"]}
+Limit: ₹{report["limit"]}
+Usage: {round(report["usage"],2)}%
+
+💯 Financial Health Score: {round(report["score"],1)}/100
+Status: {report["status"]}
+"""
@@ -0,0 +1,204 @@
+"""Rolling-window spending forecasts: exponential smoothing with day-of-week seasonality"""
+import calendar
+import math
+from datetime import date
+
+WINDOW_DAYS = 91  # days of daily totals kept for refits; older history has decayed away anyway
+ALPHA = 0.3       # level smoothing
+GAMMA = 0.1       # weekday seasonality smoothing
+BETA = 0.1        # smoothing of the squared one-step errors
+Z = 1.96          # ~95% interval
+
+TOTAL = None  # series key for spending across all categories
+
+class DailyModel:
+    """Additive Holt-Winters without trend, period 7, fed one closed day at a time"""
+    def __init__(self):
+        self.level = 0.0
+        self.season = [0.0] * 7
+        self.variance = 0.0
+        self.days = 0
+
+    def expected(self, weekday):
+        return max(0.0, self.level + self.season[weekday])
+
+    def update(self, weekday, value, alpha=ALPHA, gamma=GAMMA, beta=BETA):
+        if self.days == 0:
+            self.level = value
+        else:
+            error = value - (self.level + self.season[weekday])
+            self.variance = beta * error * error + (1 - beta) * self.variance
+            self.level = alpha * (value - self.season[weekday]) + (1 - alpha) * self.level
+            self.season[weekday] = gamma * (value - self.level) + (1 - gamma) * self.season[weekday]
+        self.days += 1
+
+def weekday_counts(first, last):
+    """How many of each weekday fall in the ordinal range first..last, in O(7)"""
+    counts = [0] * 7
+    n = last - first + 1
+    if n <= 0:
+        return counts
+    full, extra = divmod(n, 7)
+    start = date.fromordinal(first).weekday()
+    for i in range(7):
+        counts[(start + i) % 7] = full + (1 if i < extra else 0)
+    return counts
+
+class Forecaster:
+    """Month-end forecasts for total and per-category spending, updated per expense.
+
+    Days are folded into the models once a later day is seen, so each expense costs
+    O(1) and a query costs O(7). Expenses that arrive for an already folded day
+    (imports, back-dated entries) only mark the models stale; the next query refits
+    them once from the rolling window of daily totals.
+    """
+    def __init__(self, window=WINDOW_DAYS):
+        self.window = window
+        self.daily = {}       # day ordinal -> {series key: total}
+        self.first_day = None  # oldest day kept in the window
+        self.open_day = None   # latest day seen; not folded into the models yet
+        self.models = {}
+        self.stale = False
+
+    def add(self, day, category, amount):
+        """Record one expense; day is a date ordinal"""
+        if self.open_day is None:
+            self.first_day = self.open_day = day
+        elif day > self.open_day:
+            self.advance(day)
+        elif day < self.open_day:
+            if day < self.open_day - self.window:
+                return
+            self.stale = True
+            self.first_day = min(self.first_day, day)
+        totals = self.daily.setdefault(day, {})
+        totals[TOTAL] = totals.get(TOTAL, 0) + amount
+        if category is not TOTAL:
+            totals[category] = totals.get(category, 0) + amount
+
+    def advance(self, day):
+        """Close every day before `day` and make it the open day"""
+        if self.open_day is None or day <= self.open_day:
+            return
+        if not self.stale:
+            for closed in range(self.open_day, day):
+                self.fold(closed)
+        self.open_day = day
+        # Drop days that have left the window
+        while self.first_day < day - self.window:
+            self.daily.pop(self.first_day, None)
+            self.first_day += 1
+
+    def fold(self, day):
+        weekday = date.fromordinal(day).weekday()
+        totals = self.daily.get(day, {})
+        for key in totals:
+            if key not in self.models:
+                self.models[key] = DailyModel()
+        for key, model in self.models.items():
+            model.update(weekday, totals.get(key, 0.0))
+
+    def refit(self):
+        self.models = {}
+        self.stale = False
+        for day in range(self.first_day, self.open_day):
+            self.fold(day)
+
+    def month_spent(self, today, category=TOTAL):
+        """Spent so far this month; the window always covers the whole month"""
+        first = date.fromordinal(today).replace(day=1).toordinal()
+        return sum(self.daily.get(day, {}).get(category, 0.0) for day in range(first, today + 1))
+
+    def month_forecast(self, today, category=TOTAL):
+        """Expected month-end total with a confidence interval, or None before the first full day.
+
+        today is a date ordinal; category None forecasts spending across all categories.
+        """
+        self.advance(today)
+        if self.stale:
+            self.refit()
+        model = self.models.get(category)
+        if model is None or model.days == 0:
+            return None
+
+        day = date.fromordinal(today)
+        month_end = day.replace(day=calendar.monthrange(day.year, day.month)[1]).toordinal()
+        spent = self.month_spent(today, category)
+        spent_today = self.daily.get(today, {}).get(category, 0.0)
+
+        # Today counts as at least its usual spend; the rest of the month by weekday
+        expected = spent + max(0.0, model.expected(day.weekday()) - spent_today)
+        counts = weekday_counts(today + 1, month_end)
+        expected += max(0.0, sum(counts) * model.level +
+                        sum(c * s for c, s in zip(counts, model.season)))
+
+        spread = Z * math.sqrt(model.variance * (month_end - today + 1))
+        return {
+            "expected": expected,
+            "low": max(spent, expected - spread),
+            "high": expected + spread
+        }
+
+    def categories(self):
+        return [key for key in self.models if key is not TOTAL]
+
+# ---------------- BACKTEST ---------------- #
+CHECKPOINTS = (7, 14, 21)
+
+def backtest(date_totals, checkpoints=CHECKPOINTS, window=WINDOW_DAYS):
+    """Replay a per-date total history and forecast each complete month at the checkpoint days.
+
+    Returns one dict per forecast with the actual month total, the forecast and the old
+    linear (spent / day * days in month) estimate for comparison.
+    """
+    if not date_totals:
+        return []
+    days = sorted((date.fromisoformat(key).toordinal(), total) for key, total in date_totals.items())
+    last = date.fromordinal(days[-1][0])
+    month_actual = {}
+    for day, total in days:
+        month = date.fromordinal(day).strftime("%Y-%m")
+        month_actual[month] = month_actual.get(month, 0) + total
+
+    forecaster = Forecaster(window)
+    totals = dict(days)
+    results = []
+    for day in range(days[0][0], days[-1][0] + 1):
+        current = date.fromordinal(day)
+        if day in totals:
+            forecaster.add(day, TOTAL, totals[day])
+
+        month_length = calendar.monthrange(current.year, current.month)[1]
+        complete = current.replace(day=month_length) <= last
+        if current.day not in checkpoints or not complete:
+            continue
+        forecast = forecaster.month_forecast(day)
+        if forecast is None:
+            continue
+        month = current.strftime("%Y-%m")
+        spent = forecaster.month_spent(day)
+        results.append(dict(
+            forecast,
+            month=month,
+            checkpoint=current.day,
+            actual=month_actual.get(month, 0),  # a month without spending scores nothing
+            linear=spent / current.day * month_length
+        ))
+    return results
+
+def score(results):
+    """Per-checkpoint mean absolute percentage error for the forecast and the linear estimate,
+    plus how often the actual total fell inside the interval"""
+    scores = {}
+    for result in results:
+        if not result["actual"]:
+            continue
+        entry = scores.setdefault(result["checkpoint"], {"months": 0, "mape": 0.0, "linear_mape": 0.0, "coverage": 0.0})
+        entry["months"] += 1
+        entry["mape"] += abs(result["expected"] - result["actual"]) / result["actual"]
+        entry["linear_mape"] += abs(result["linear"] - result["actual"]) / result["actual"]
+        entry["coverage"] += result["low"] <= result["actual"] <= result["high"]
+    for entry in scores.values():
+        for key in ("mape", "linear_mape", "coverage"):
+            entry[key] = entry[key] / entry["months"] * 100
+    return dict(sorted(scores.items()))
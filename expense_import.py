@@ -0,0 +1,186 @@
+"""Streaming CSV / bank-statement import for the expense engine"""
+import csv
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import expense_core as core
+
+CHUNK_ROWS = 5000
+
+DATE_COLUMNS = ("date", "transaction date", "txn date", "value date", "posting date")
+DEBIT_COLUMNS = ("debit", "withdrawal", "withdrawal amount")  # spending only, whatever the sign
+SIGNED_COLUMNS = ("amount", "value")                           # spending negative, credits positive
+CREDIT_COLUMNS = ("credit", "deposit", "deposit amount")
+TYPE_COLUMNS = ("cr/dr", "dr/cr", "debit/credit", "credit/debit")
+TEXT_COLUMNS = ("category", "description", "narration", "details", "particulars", "remarks")
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y", "%d-%b-%Y", "%d %b %Y", "%m/%d/%Y")
+
+# Statement text keywords mapped onto the app's categories; matched at word starts
+CATEGORY_KEYWORDS = {
+    "Food": ("food", "restaurant", "cafe", "swiggy", "zomato", "grocery", "supermarket", "bakery"),
+    "Travel": ("travel", "uber", "ola", "irctc", "rail", "airline", "airways", "flight", "fuel", "petrol", "metro", "redbus"),
+    "Shopping": ("shopping", "amazon", "flipkart", "myntra", "store", "mart", "mall"),
+    "Bills": ("bill", "electric", "water", "gas", "recharge", "broadband", "insurance", "rent", "loan"),
+    "Entertainment": ("entertainment", "movie", "netflix", "spotify", "cinema", "game"),
+}
+CATEGORY_PATTERNS = [
+    (category, re.compile(r"\b(?:" + "|".join(keywords) + ")"))
+    for category, keywords in CATEGORY_KEYWORDS.items()
+]
+
+def map_category(text):
+    text = text.lower()
+    for category in core.CATEGORIES:
+        if text == category.lower():
+            return category
+    for category, pattern in CATEGORY_PATTERNS:
+        if pattern.search(text):
+            return category
+    return "Other"
+
+def find_column(header, names):
+    lowered = [name.strip().lower() for name in header]
+    for name in names:
+        if name in lowered:
+            return lowered.index(name)
+    return None
+
+def detect_columns(header):
+    """Work out which header columns hold the date, amount and description"""
+    columns = {
+        "date": find_column(header, DATE_COLUMNS),
+        "amount": find_column(header, DEBIT_COLUMNS),
+        "text": find_column(header, TEXT_COLUMNS),
+        "credit": find_column(header, CREDIT_COLUMNS),
+        "type": find_column(header, TYPE_COLUMNS),
+        "sign": "debit"
+    }
+    if columns["amount"] is None:
+        columns["amount"] = find_column(header, SIGNED_COLUMNS)
+        # An expense list such as a report CSV has a category column and positive amounts
+        listed = find_column(header, ("category",)) is not None
+        columns["sign"] = "listed" if listed and columns["type"] is None and columns["credit"] is None else "signed"
+    if columns["date"] is None or columns["amount"] is None:
+        raise ValueError("CSV needs a date column and an amount/debit column")
+    return columns
+
+def parse_date(text):
+    text = text.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    return None
+
+def parse_amount(text):
+    text = text.strip().replace(",", "").replace("₹", "").replace("Rs.", "").replace("INR", "")
+    if not text:
+        return None
+    # Statements often show spending as negative numbers or in parentheses
+    negative = text.startswith("(") and text.endswith(")")
+    try:
+        value = float(text.strip("()"))
+    except ValueError:
+        return None
+    return -value if negative else value
+
+def parse_spending(row, columns):
+    """Amount spent in a statement row, or None for credits and unreadable amounts"""
+    amount = parse_amount(row[columns["amount"]])
+    if amount is None or columns["sign"] == "debit":
+        return abs(amount) if amount is not None else None
+    if columns["type"] is not None:
+        # A Cr/Dr column decides on its own; D, Dr and Debit are spending
+        return abs(amount) if row[columns["type"]].strip().lower().startswith("d") else None
+    if columns["credit"] is not None:
+        return None if parse_amount(row[columns["credit"]]) else abs(amount)
+    if columns["sign"] == "listed":
+        return amount if amount > 0 else None
+    return -amount if amount < 0 else None
+
+def parse_chunk(rows, columns):
+    """Turn parsed CSV records into expense dicts; returns (expenses, skipped)"""
+    expenses = []
+    skipped = 0
+    for row in rows:
+        try:
+            day = parse_date(row[columns["date"]])
+            amount = parse_spending(row, columns)
+            text = row[columns["text"]] if columns["text"] is not None else ""
+        except IndexError:
+            day = amount = None
+        if day is None or not amount:
+            skipped += 1
+            continue
+        expenses.append({"amount": amount, "category": map_category(text), "date": day})
+    return expenses, skipped
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield (columns, rows, bytes_read) for successive chunks of CSV records.
+    Chunks end between records, so a quoted field spanning several lines stays whole"""
+    bytes_read = 0
+
+    def lines(f):
+        nonlocal bytes_read
+        for raw in f:
+            bytes_read += len(raw)
+            yield raw.decode("utf-8", errors="replace")
+
+    with open(path, "rb") as f:
+        reader = csv.reader(lines(f))
+        header = next(reader, [])
+        if header:
+            header[0] = header[0].lstrip("\ufeff")
+        columns = detect_columns(header)
+
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if len(rows) >= chunk_rows:
+                yield columns, rows, bytes_read
+                rows = []
+        if rows:
+            yield columns, rows, bytes_read
+
+def _parse_job(job):
+    columns, rows, bytes_read = job
+    expenses, skipped = parse_chunk(rows, columns)
+    return expenses, skipped, bytes_read
+
+def iter_batches(path, chunk_rows=CHUNK_ROWS, workers=0):
+    """Yield (expenses, skipped, fraction_done) per chunk, parsing on a process pool if workers > 0"""
+    total_bytes = os.path.getsize(path) or 1
+    jobs = read_chunks(path, chunk_rows)
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Keep only a couple of chunks per worker in flight so memory stays bounded
+            pending = deque()
+            for job in jobs:
+                pending.append(pool.submit(_parse_job, job))
+                if len(pending) >= workers * 2:
+                    expenses, skipped, bytes_read = pending.popleft().result()
+                    yield expenses, skipped, bytes_read / total_bytes
+            while pending:
+                expenses, skipped, bytes_read = pending.popleft().result()
+                yield expenses, skipped, bytes_read / total_bytes
+    else:
+        for job in jobs:
+            expenses, skipped, bytes_read = _parse_job(job)
+            yield expenses, skipped, bytes_read / total_bytes
+
+def import_csv(ledger, path, chunk_rows=CHUNK_ROWS, workers=0, on_progress=None):
+    """Import a CSV into the ledger one batch per chunk; returns (imported, skipped)"""
+    imported = 0
+    skipped = 0
+    for expenses, bad_rows, fraction in iter_batches(path, chunk_rows, workers):
+        if expenses:
+            ledger.add_expenses(expenses)
+        imported += len(expenses)
+        skipped += bad_rows
+        if on_progress:
+            on_progress(imported, fraction)
+    return imported, skipped
@@ -0,0 +1,146 @@
+"""Monthly report export: aggregates, Agg-rendered PDF/PNG pages and streamed CSV, built off the UI"""
+import csv
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import expense_core as core
+
+FORMATS = ("pdf", "png", "csv")
+WORKERS = 2
+
+COLORS = ["#E91E63", "#4CAF50", "#FF9800", "#F44336", "#9C27B0", "#3498DB"]
+
+def build_job(ledger, month, title, directory, formats=FORMATS):
+    """Everything a worker needs for one report; the month's rows are copied, not shared"""
+    return {
+        "title": title,
+        "month": month,
+        # Limits are only known for the open month
+        "limit": ledger.data["monthly_limit"] if month == core.month_str() else 0,
+        "store": ledger.load_month(month),
+        "directory": directory,
+        "formats": tuple(formats)
+    }
+
+def write_csv(path, store):
+    """Stream the rows to disk one at a time; nothing is built up in memory first"""
+    def write(f):
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(("date", "category", "amount"))
+        for i in range(len(store)):
+            writer.writerow(store.row(i))
+    core.write_atomic(path, write)
+    return path
+
+def render_figure(title, month, report, total, by_category, by_date):
+    # Only the Agg canvas is used, so no display or GUI toolkit is touched
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from matplotlib import dates as mdates
+
+    fig = Figure(figsize=(11, 8.5), dpi=100)
+    FigureCanvasAgg(fig)
+    fig.suptitle(f"{title} - {month}", fontsize=16, weight="bold")
+
+    summary = fig.add_subplot(221)
+    summary.axis("off")
+    lines = [f"Total spent: Rs {total:,.2f}"]
+    if report is not None:
+        # Glyph-free status for the PDF fonts
+        lines += [f"Limit: Rs {report['limit']:,.2f}",
+                  f"Usage: {report['usage']:.1f}%",
+                  f"Health score: {report['score']:.1f}/100",
+                  f"Status: {report['status'].split(' ', 1)[-1]}"]
+    if by_category:
+        top = max(by_category, key=by_category.get)
+        lines.append(f"Top category: {top} (Rs {by_category[top]:,.2f})")
+    summary.text(0.05, 0.95, "\n".join(lines), va="top", fontsize=12, family="monospace")
+
+    categories = list(by_category)
+    amounts = [by_category[c] for c in categories]
+    pie = fig.add_subplot(222)
+    if amounts:
+        pie.pie(amounts, labels=categories, autopct="%1.1f%%", colors=COLORS, startangle=90)
+    pie.set_title("Category Distribution")
+
+    bars = fig.add_subplot(223)
+    bars.bar(range(len(categories)), amounts, color=COLORS)
+    bars.set_xticks(range(len(categories)))
+    bars.set_xticklabels(categories, rotation=45, fontsize=9)
+    bars.set_title("Category Spending")
+
+    trend = fig.add_subplot(224)
+    days = sorted(by_date)
+    if days:
+        trend.plot(mdates.date2num([date.fromisoformat(day) for day in days]),
+                   [by_date[day] for day in days], marker="o", color=COLORS[0])
+        trend.xaxis.set_major_formatter(mdates.DateFormatter("%d"))
+    trend.set_title("Daily Spending")
+    trend.grid(alpha=0.3, linestyle="--")
+
+    fig.tight_layout(rect=(0, 0, 1, 0.95))
+    return fig
+
+def run_job(job):
+    """Compute the month's aggregates and write each requested format; runs in a worker"""
+    store = job["store"]
+    by_category = store.category_sums()
+    by_date = store.date_sums()
+    total = sum(by_category.values())
+    report = core.build_report(total, job["limit"])
+
+    base = os.path.join(job["directory"], f"{job['title']}_{job['month']}")
+    files = []
+    if "csv" in job["formats"]:
+        files.append(write_csv(base + ".csv", store))
+    images = [fmt for fmt in ("pdf", "png") if fmt in job["formats"]]
+    if images:
+        fig = render_figure(job["title"], job["month"], report, total, by_category, by_date)
+        for fmt in images:
+            fig.savefig(base + "." + fmt, format=fmt)
+            files.append(base + "." + fmt)
+    return {"title": job["title"], "month": job["month"], "rows": len(store), "total": total, "files": files}
+
+def make_executor(workers=WORKERS):
+    """Process pool for report jobs.
+
+    Workers are always spawned, never forked: the GUI that submits jobs runs Tk and
+    several threads, which a forked child would inherit in an undefined state. Spawned
+    workers re-import the main module, so callers need an `if __name__ == "__main__"` guard.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+class ReportPool:
+    """Runs report jobs in the background and hands each result or error to a callback.
+
+    Callbacks fire on a pool thread; a Tk caller should queue them for its main loop.
+    """
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self.executor = None
+
+    def submit(self, job, on_done):
+        # Worker processes are only started once the first report is asked for
+        if self.executor is None:
+            self.executor = make_executor(self.workers)
+        future = self.executor.submit(run_job, job)
+        future.add_done_callback(lambda done: on_done(done.exception() or done.result()))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+def run_reports(jobs, workers=WORKERS):
+    """Yield results for a stream of jobs, keeping at most two per worker in flight"""
+    with make_executor(workers) as pool:
+        pending = deque()
+        for job in jobs:
+            pending.append(pool.submit(run_job, job))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
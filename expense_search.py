@@ -0,0 +1,167 @@
+"""Indexed search over an expense store: a sorted date index and per-category posting lists"""
+from array import array
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class DateIndex:
+    """Row numbers ordered by day, with the days alongside for bisecting.
+
+    Rows mostly arrive in date order, which appends in O(1); a backdated row is inserted.
+    """
+    def __init__(self):
+        self.days = array("i")
+        self.rows = array("i")
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, day, row):
+        if not self.days or day >= self.days[-1]:
+            self.days.append(day)
+            self.rows.append(row)
+        else:
+            at = bisect_right(self.days, day)
+            self.days.insert(at, day)
+            self.rows.insert(at, row)
+
+    def span(self, first=None, last=None):
+        """Positions lo..hi of the rows whose day lies in first..last; O(log n)"""
+        lo = 0 if first is None else bisect_left(self.days, first)
+        hi = len(self.days) if last is None else bisect_right(self.days, last)
+        return lo, max(lo, hi)
+
+def int_array(values):
+    column = array("i")
+    column.frombytes(values.astype(np.int32).tobytes())
+    return column
+
+class ExpenseIndex:
+    """Date index over the whole store plus one date-ordered posting list per category.
+
+    Built on the first query and then kept current by indexing only the rows appended
+    since, so adding expenses costs nothing until someone searches. reset() is for when
+    the store's rows are replaced.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.reset()
+
+    def reset(self):
+        self.by_date = DateIndex()
+        self.by_category = {}  # category code -> DateIndex
+        self.indexed = 0
+
+    def catch_up(self):
+        store = self.store
+        if len(store) < self.indexed:
+            self.reset()
+        if not self.indexed and len(store) and np is not None:
+            # One stable argsort instead of a row-at-a-time build
+            days = np.frombuffer(store.days, dtype=np.int32)
+            order = np.argsort(days, kind="stable")
+            self.by_date.days = int_array(days[order])
+            self.by_date.rows = int_array(order)
+            codes = np.frombuffer(store.category_codes, dtype=np.uint16)[order]
+            for code in np.unique(codes):
+                postings = self.by_category[int(code)] = DateIndex()
+                rows = order[codes == code]
+                postings.days = int_array(days[rows])
+                postings.rows = int_array(rows)
+            self.indexed = len(store)
+        for row in range(self.indexed, len(store)):
+            day = store.days[row]
+            self.by_date.add(day, row)
+            self.by_category.setdefault(store.category_codes[row], DateIndex()).add(day, row)
+        self.indexed = len(store)
+
+    def rows(self, first=None, last=None, categories=None):
+        """Row numbers with a day in first..last (ordinals) and one of the categories, in day order"""
+        self.catch_up()
+        if categories is None:
+            lists = [self.by_date]
+        else:
+            codes = [self.store.category_ids.get(category) for category in categories]
+            lists = [self.by_category[code] for code in codes if code in self.by_category]
+        spans = [(postings, *postings.span(first, last)) for postings in lists]
+        if np is not None:
+            rows = [np.frombuffer(postings.rows, dtype=np.int32)[lo:hi] for postings, lo, hi in spans]
+            if len(rows) == 1:
+                return rows[0]
+            days = np.concatenate([np.frombuffer(postings.days, dtype=np.int32)[lo:hi]
+                                   for postings, lo, hi in spans] or [np.empty(0, dtype=np.int32)])
+            rows = np.concatenate(rows or [np.empty(0, dtype=np.int32)])
+            return rows[np.argsort(days, kind="stable")]
+        merged = []
+        for postings, lo, hi in spans:
+            merged.extend(zip(postings.days[lo:hi], postings.rows[lo:hi]))
+        merged.sort()
+        return [row for _, row in merged]
+
+def take(store, rows, min_amount=None, max_amount=None):
+    """New store with the given rows of store, in that order, keeping amounts in the band"""
+    other = type(store)()
+    if np is not None:
+        rows = np.asarray(rows, dtype=np.int64)
+        amounts = np.frombuffer(store.amounts, dtype=np.float64)[rows] if len(store) else np.empty(0)
+        if min_amount is not None or max_amount is not None:
+            keep = np.ones(len(rows), dtype=bool)
+            if min_amount is not None:
+                keep &= amounts >= min_amount
+            if max_amount is not None:
+                keep &= amounts <= max_amount
+            rows, amounts = rows[keep], amounts[keep]
+        if len(rows):
+            other.load_columns(amounts, np.frombuffer(store.category_codes, dtype=np.uint16)[rows],
+                               np.frombuffer(store.days, dtype=np.int32)[rows], store.category_names)
+        return other
+    for row in rows:
+        amount = store.amounts[row]
+        if (min_amount is None or amount >= min_amount) and (max_amount is None or amount <= max_amount):
+            other.amounts.append(amount)
+            other.category_codes.append(other.intern(store.category_names[store.category_codes[row]]))
+            other.days.append(store.days[row])
+    return other
+
+def scan(store, first=None, last=None, categories=None, min_amount=None, max_amount=None):
+    """The same query without an index, for stores searched once, such as an archived month"""
+    codes = None if categories is None else [store.category_ids[c] for c in categories if c in store.category_ids]
+    if np is not None:
+        days = np.frombuffer(store.days, dtype=np.int32)
+        keep = np.ones(len(days), dtype=bool)
+        if first is not None:
+            keep &= days >= first
+        if last is not None:
+            keep &= days <= last
+        if codes is not None:
+            keep &= np.isin(np.frombuffer(store.category_codes, dtype=np.uint16), codes)
+        rows = np.flatnonzero(keep)
+        rows = rows[np.argsort(days[rows], kind="stable")]
+    else:
+        rows = [
+            row for row in range(len(store))
+            if (first is None or store.days[row] >= first) and (last is None or store.days[row] <= last)
+            and (codes is None or store.category_codes[row] in codes)
+        ]
+        rows.sort(key=store.days.__getitem__)
+    return take(store, rows, min_amount, max_amount)
+
+def concat(stores):
+    """One store holding the rows of several (at least one), in order; category codes are re-interned"""
+    filled = [store for store in stores if len(store)]
+    if len(filled) <= 1:
+        return filled[0] if filled else stores[0]
+    result = type(filled[0])()
+    for store in filled:
+        mapping = [result.intern(name) for name in store.category_names]
+        result.amounts.extend(store.amounts)
+        if np is not None:
+            codes = np.array(mapping, dtype=np.uint16)[np.frombuffer(store.category_codes, dtype=np.uint16)]
+            result.category_codes.frombytes(codes.tobytes())
+        else:
+            result.category_codes.extend(mapping[code] for code in store.category_codes)
+        result.days.extend(store.days)
+    return result
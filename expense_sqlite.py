@@ -0,0 +1,373 @@
+"""SQLite storage backend for the expense engine, with aggregates computed in SQL"""
+import json
+import sqlite3
+from datetime import date
+
+import expense_anomaly
+import expense_budgets
+import expense_core as core
+import expense_forecast as forecast
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS budgets (
+    name TEXT PRIMARY KEY,
+    amount REAL NOT NULL,
+    category TEXT,
+    period TEXT NOT NULL,
+    start_date TEXT,
+    end_date TEXT
+);
+-- Anomaly statistics per category, as JSON, updated in the same transaction as the inserts
+CREATE TABLE IF NOT EXISTS anomaly_stats (
+    category TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    date TEXT NOT NULL
+);
+-- Covers month-scoped category sums as well as plain date ranges
+DROP INDEX IF EXISTS expenses_date;
+CREATE INDEX IF NOT EXISTS expenses_date_category ON expenses (date, category, amount);
+CREATE INDEX IF NOT EXISTS expenses_category ON expenses (category, amount);
+
+-- Per-date totals kept current by a trigger so status queries never scan expenses
+CREATE TABLE IF NOT EXISTS date_totals (
+    date TEXT PRIMARY KEY,
+    total REAL NOT NULL
+);
+-- Earlier databases kept all-time category totals; queries are month-scoped now
+DROP TRIGGER IF EXISTS expenses_totals;
+DROP TABLE IF EXISTS category_totals;
+CREATE TRIGGER IF NOT EXISTS expenses_date_totals AFTER INSERT ON expenses
+BEGIN
+    INSERT INTO date_totals (date, total) VALUES (NEW.date, NEW.amount)
+        ON CONFLICT (date) DO UPDATE SET total = total + NEW.amount;
+END;
+
+-- The same per-date totals for the open period only; a month reset empties it
+CREATE TABLE IF NOT EXISTS period_totals (
+    date TEXT PRIMARY KEY,
+    total REAL NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS expenses_period_totals AFTER INSERT ON expenses
+BEGIN
+    INSERT INTO period_totals (date, total) VALUES (NEW.date, NEW.amount)
+        ON CONFLICT (date) DO UPDATE SET total = total + NEW.amount;
+END;
+"""
+
+# Settings rows that track the open period rather than user settings
+PERIOD_KEYS = ("period_start", "period_month")
+
+def month_range(month):
+    # "-32" sorts after every day of the month and before the next month
+    return month + "-01", month + "-32"
+
+def filter_clauses(first=None, last=None, categories=None, min_amount=None, max_amount=None):
+    """WHERE clauses and parameters for the query filters; dates are checked like Ledger.query"""
+    first, last = first or None, last or None
+    for day in (first, last):
+        if day is not None:
+            date.fromisoformat(day)
+    clauses, params = [], []
+    for clause, value in (("date >= ?", first), ("date <= ?", last),
+                          ("amount >= ?", min_amount), ("amount <= ?", max_amount)):
+        if value is not None:
+            clauses.append(clause)
+            params.append(value)
+    if categories is not None:
+        clauses.append(f"category IN ({', '.join('?' * len(categories))})" if categories else "0")
+        params.extend(categories)
+    return clauses, params
+
+# ---------------- ROW ACCESS ---------------- #
+class SqliteRows:
+    """Store-like view over the open period's rows of the expenses table, for the virtual history"""
+    def __init__(self, conn, first_id=1):
+        self.conn = conn
+        self.start(first_id)
+
+    def start(self, first_id):
+        self.first_id = first_id
+        self.count = self.conn.execute("SELECT COUNT(*) FROM expenses WHERE id >= ?", (first_id,)).fetchone()[0]
+
+    def __len__(self):
+        return self.count
+
+    def row(self, i):
+        # Rows are only ever appended, so the period's ids run first_id..first_id + count - 1
+        return self.conn.execute(
+            "SELECT date, category, amount FROM expenses WHERE id = ?", (self.first_id + i,)
+        ).fetchone()
+
+    def records(self):
+        for amount, category, day in self.conn.execute(
+                "SELECT amount, category, date FROM expenses WHERE id >= ? ORDER BY id", (self.first_id,)):
+            yield {"amount": amount, "category": category, "date": day}
+
+# ---------------- LEDGER ---------------- #
+class SqliteLedger(core.Ledger):
+    """Ledger kept in an SQLite database; only settings are held in memory.
+
+    Every expense stays in the database. Like the file ledger's open partition, the
+    totals and the history cover the open period: the current month, from the first
+    expense added after the last reset.
+    """
+    def __init__(self, db_file):
+        self.data_file = db_file
+        self.recovered_from = None
+        self.version = 0
+        self.replaced = 0
+        self.alerts = []
+        self.anomalies = []
+        self.observers = []
+        # The GUI opens the ledger on a worker thread and then uses it from the Tk thread only
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.data = self.load_data()
+        self.store = SqliteRows(self.conn, self.open_period())
+        self.seed_forecast()
+        self.rebuild_streaks()
+        self.seed_detector()
+        self.budget_tracker = expense_budgets.BudgetTracker(self.data["budgets"], self.window_total)
+
+    def load_data(self):
+        loaded = {"monthly_limit": 0, "daily_limit": 0, "streak_start": core.month_start_ordinal()}
+        for key, value in self.conn.execute("SELECT key, value FROM settings WHERE key != 'streak'"):
+            if key not in PERIOD_KEYS:
+                loaded[key] = value
+        loaded["streak_start"] = int(loaded["streak_start"])
+        loaded["budgets"] = [
+            {"name": name, "limit": limit, "category": category, "period": period, "start": start, "end": end}
+            for name, limit, category, period, start, end in self.conn.execute(
+                "SELECT name, amount, category, period, start_date, end_date FROM budgets ORDER BY rowid")
+        ]
+        return loaded
+
+    def next_id(self):
+        return self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM expenses").fetchone()[0]
+
+    def save_period(self, first_id, month_start):
+        self.conn.executemany("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                              [("period_start", first_id), ("period_month", month_start)])
+        self.period_month = month_start
+
+    def open_period(self):
+        """First expense id of the open period, moving the period on when the month has changed"""
+        saved = dict(self.conn.execute(
+            f"SELECT key, value FROM settings WHERE key IN ({', '.join('?' * len(PERIOD_KEYS))})", PERIOD_KEYS))
+        month_start = core.month_start_ordinal()
+        first_day = date.fromordinal(month_start).isoformat()
+        with self.conn:
+            if "period_start" not in saved:
+                # Databases from before resets were recorded: the whole current month is open
+                self.conn.execute("DELETE FROM period_totals")
+                self.conn.execute("INSERT INTO period_totals SELECT date, total FROM date_totals WHERE date >= ?",
+                                  (first_day,))
+                saved = {"period_start": 1, "period_month": 0}  # moved onto this month below
+            first_id = int(saved["period_start"])
+            if int(saved["period_month"]) != month_start:
+                # Earlier months drop out of the period, as the file ledger archives them
+                first_id = self.conn.execute(
+                    "SELECT COALESCE(MIN(id), ?) FROM expenses WHERE id >= ? AND date >= ?",
+                    (self.next_id(), first_id, first_day)).fetchone()[0]
+                self.conn.execute("DELETE FROM period_totals WHERE date < ?", (first_day,))
+            self.save_period(first_id, month_start)
+        return first_id
+
+    def seed_forecast(self):
+        self.forecaster = forecast.Forecaster()
+        oldest = date.fromordinal(date.today().toordinal() - forecast.WINDOW_DAYS).isoformat()
+        for day, category, amount in self.conn.execute(
+                "SELECT date, category, SUM(amount) FROM expenses WHERE date >= ? "
+                "GROUP BY date, category ORDER BY date", (oldest,)):
+            self.forecaster.add(date.fromisoformat(day).toordinal(), category, amount)
+
+    def seed_detector(self):
+        rows = self.conn.execute("SELECT category, state FROM anomaly_stats").fetchall()
+        if rows or not self.conn.execute("SELECT 1 FROM expenses LIMIT 1").fetchone():
+            self.detector = expense_anomaly.AnomalyDetector({
+                "version": expense_anomaly.STATE_VERSION,
+                "categories": {category: json.loads(state) for category, state in rows}
+            })
+            return
+        # Databases from before the statistics existed are scanned once
+        self.detector = expense_anomaly.AnomalyDetector()
+        for amount, category, day in self.conn.execute(
+                "SELECT amount, category, date FROM expenses ORDER BY date, id"):
+            self.detector.add(date.fromisoformat(day).toordinal(), category, amount, flag=False)
+        with self.conn:
+            self.save_detector(self.detector.categories)
+
+    def save_detector(self, categories):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO anomaly_stats (category, state) VALUES (?, ?)",
+            [(category, json.dumps(self.detector.categories[category].state())) for category in categories]
+        )
+
+    def save_data(self):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                [(key, self.data[key]) for key in core.SETTINGS]
+            )
+            self.conn.execute("DELETE FROM budgets")
+            self.conn.executemany(
+                "INSERT INTO budgets (name, amount, category, period, start_date, end_date) VALUES (?, ?, ?, ?, ?, ?)",
+                [(b["name"], b["limit"], b["category"], b["period"], b["start"], b["end"])
+                 for b in self.data["budgets"]]
+            )
+
+    def add_expenses(self, expenses):
+        """Insert a batch of expense dicts in one transaction"""
+        for exp in expenses:
+            core.check_expense(exp)
+        self.budget_tracker.roll()
+        if self.period_month != core.month_start_ordinal():
+            self.store.start(self.open_period())
+            self.replaced += 1
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO expenses (amount, category, date) VALUES (?, ?, ?)",
+                [(exp["amount"], exp["category"], exp["date"]) for exp in expenses]
+            )
+            for exp in expenses:
+                day = date.fromisoformat(exp["date"]).toordinal()
+                self.forecaster.add(day, exp["category"], exp["amount"])
+                self.alerts.extend(self.budget_tracker.add(day, exp["category"], exp["amount"]))
+                self.anomalies.extend(self.detector.add(day, exp["category"], exp["amount"]))
+            self.save_detector({exp["category"] for exp in expenses})
+        self.store.count += len(expenses)
+        self.track_streak({exp["date"] for exp in expenses})
+        self.version += 1
+        for observer in self.observers:
+            observer(expenses)
+
+    def reset_month(self):
+        """Start a new period: expenses stay in the database, but totals and history start empty"""
+        self.data["monthly_limit"] = 0
+        self.data["daily_limit"] = 0
+        self.data["streak_start"] = date.today().toordinal()
+        first_id = self.next_id()
+        with self.conn:
+            self.conn.execute("DELETE FROM period_totals")
+            self.save_period(first_id, core.month_start_ordinal())
+        self.store.start(first_id)
+        self.replaced += 1
+        self.rebuild_streaks()
+        self.version += 1
+        self.save_data()
+
+    def pop_write_error(self):
+        # Writes are transactions on the calling thread, so failures raise where they happen
+        return None
+
+    def close(self):
+        self.conn.close()
+
+    # -------- QUERIES -------- #
+    def get_total(self):
+        return self.conn.execute(
+            "SELECT COALESCE(SUM(total), 0) FROM period_totals WHERE date >= ? AND date < ?",
+            month_range(core.month_str())
+        ).fetchone()[0]
+
+    def get_today_total(self):
+        row = self.conn.execute("SELECT total FROM period_totals WHERE date = ?", (core.today_str(),)).fetchone()
+        return row[0] if row else 0
+
+    def top_category(self):
+        category_totals = self.category_totals()
+        if not category_totals:
+            return None
+        return max(category_totals, key=category_totals.get)
+
+    def category_totals(self):
+        return dict(self.conn.execute(
+            "SELECT category, SUM(amount) FROM expenses WHERE date >= ? AND date < ? AND id >= ? GROUP BY category",
+            (*month_range(core.month_str()), self.store.first_id)
+        ))
+
+    def date_totals(self):
+        return dict(self.conn.execute(
+            "SELECT date, total FROM period_totals WHERE date >= ? AND date < ? ORDER BY date",
+            month_range(core.month_str())
+        ))
+
+    def month_totals(self):
+        return dict(self.conn.execute(
+            "SELECT substr(date, 1, 7), SUM(total) FROM date_totals GROUP BY 1 ORDER BY 1"
+        ))
+
+    def day_total(self, day):
+        row = self.conn.execute("SELECT total FROM date_totals WHERE date = ?", (day,)).fetchone()
+        return row[0] if row else 0
+
+    def daily_history(self):
+        return dict(self.conn.execute("SELECT date, total FROM date_totals ORDER BY date"))
+
+    def window_total(self, first, last, category=None):
+        first, last = date.fromordinal(first).isoformat(), date.fromordinal(last).isoformat()
+        if category is None:
+            return self.conn.execute(
+                "SELECT COALESCE(SUM(total), 0) FROM date_totals WHERE date >= ? AND date <= ?", (first, last)
+            ).fetchone()[0]
+        return self.conn.execute(
+            "SELECT COALESCE(SUM(amount), 0) FROM expenses WHERE date >= ? AND date <= ? AND category = ?",
+            (first, last, category)
+        ).fetchone()[0]
+
+    def load_month(self, month):
+        store = core.ExpenseStore()
+        for amount, category, day in self.conn.execute(
+                "SELECT amount, category, date FROM expenses WHERE date >= ? AND date < ? ORDER BY id",
+                month_range(month)):
+            store.append(amount, category, day)
+        return store
+
+    def query(self, first=None, last=None, categories=None, min_amount=None, max_amount=None):
+        """Same filters as Ledger.query, answered from the date and category indexes"""
+        clauses, params = filter_clauses(first, last, categories, min_amount, max_amount)
+        return self.select(clauses, params, "date, id")
+
+    def query_added(self, start, first=None, last=None, categories=None, min_amount=None, max_amount=None):
+        """Same filters over just the open period's rows from row start on, in the order added"""
+        clauses, params = filter_clauses(first, last, categories, min_amount, max_amount)
+        return self.select(clauses + ["id >= ?"], params + [self.store.first_id + start], "id")
+
+    def select(self, clauses, params, order):
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        store = core.ExpenseStore()
+        for amount, category, day in self.conn.execute(
+                f"SELECT amount, category, date FROM expenses{where} ORDER BY {order}", params):
+            store.append(amount, category, day)
+        return store
+
+# ---------------- MIGRATION ---------------- #
+def migrate_json(json_file, db_file):
+    """One-shot copy of a file ledger (archive, snapshot and journal) into an SQLite database"""
+    source = core.Ledger(json_file)
+    target = SqliteLedger(db_file)
+    if target.next_id() > 1:
+        target.close()
+        raise ValueError(f"{db_file} already contains expenses")
+
+    for month in source.archive.months():
+        target.add_expenses(list(source.archive.load_month(month).records()))
+    target.add_expenses(list(source.store.records()))
+    for key in core.SETTINGS:
+        target.data[key] = source.data[key]
+    target.data["budgets"] = source.data["budgets"]
+    target.save_data()
+    count = target.next_id() - 1
+    target.close()
+    return count
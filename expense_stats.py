@@ -0,0 +1,124 @@
+"""Opt-in instrumentation: call timers, counters and cProfile/tracemalloc dumps.
+
+Enabled with EXPENSE_STATS=1 or the --stats flag. Nothing is wrapped until
+instrument() runs, so a disabled build pays no per-call cost at all.
+"""
+import cProfile
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+ENV_VAR = "EXPENSE_STATS"
+
+# Engine methods worth timing: persistence, aggregate queries and forecasting
+ENGINE_METHODS = {
+    "Ledger": ("load_data", "save_data", "add_expenses", "roll_over", "rebuild_index",
+               "get_total", "get_today_total", "top_category", "category_totals", "date_totals",
+               "streaks", "predict_spending", "generate_report", "query"),
+    "Persister": ("write_pending",),
+    "SqliteLedger": ("load_data", "save_data", "add_expenses", "get_total", "get_today_total",
+                     "top_category", "category_totals", "date_totals", "query"),
+}
+
+enabled = False
+instrumented = False
+timers = {}    # name -> [calls, total seconds, max seconds]
+counters = {}  # name -> count
+lock = threading.Lock()  # the persister thread records too
+profiler = None
+
+def env_enabled():
+    return os.environ.get(ENV_VAR, "") not in ("", "0")
+
+def enable():
+    global enabled
+    enabled = True
+
+def record(name, seconds):
+    with lock:
+        entry = timers.get(name)
+        if entry is None:
+            timers[name] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+def count(name, n=1):
+    if enabled:
+        with lock:
+            counters[name] = counters.get(name, 0) + n
+
+def timed(name, func):
+    """Wrap func so every call is recorded under name"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(name, time.perf_counter() - start)
+    return wrapper
+
+def instrument(cls, *names):
+    """Time the given methods, skipping inherited ones so overrides are not counted twice"""
+    for name in names:
+        if name in cls.__dict__:
+            setattr(cls, name, timed(f"{cls.__name__}.{name}", cls.__dict__[name]))
+
+def instrument_engine():
+    global instrumented
+    if instrumented:
+        return
+    instrumented = True
+    import expense_core as core
+    import expense_sqlite
+
+    for cls in (core.Ledger, core.Persister, expense_sqlite.SqliteLedger):
+        instrument(cls, *ENGINE_METHODS[cls.__name__])
+
+def reset():
+    with lock:
+        timers.clear()
+        counters.clear()
+
+def summary(limit=None):
+    """Text table of the timers by total time, followed by the counters"""
+    with lock:
+        rows = sorted(timers.items(), key=lambda item: item[1][1], reverse=True)
+        counts = sorted(counters.items())
+    lines = [f"{'call':<28}{'n':>7}{'avg ms':>9}{'max ms':>9}{'total s':>9}"]
+    for name, (calls, total, worst) in rows[:limit]:
+        lines.append(f"{name[-28:]:<28}{calls:>7}{total / calls * 1000:>9.2f}{worst * 1000:>9.2f}{total:>9.2f}")
+    for name, value in counts:
+        lines.append(f"{name[-28:]:<28}{value:>7}")
+    return "\n".join(lines)
+
+def dump_name(kind, extension, directory):
+    return os.path.join(directory, f"expense_{kind}_{datetime.now():%Y%m%d-%H%M%S}.{extension}")
+
+def toggle_profile(directory="."):
+    """Start cProfile, or stop it and write the profile; returns the file written, if any"""
+    global profiler
+    if profiler is None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return None
+    profiler.disable()
+    path = dump_name("profile", "prof", directory)
+    profiler.dump_stats(path)
+    profiler = None
+    return path
+
+def dump_memory(directory="."):
+    """Start tracemalloc, or write a snapshot of what it has traced; returns the file written, if any"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(10)
+        return None
+    path = dump_name("memory", "tracemalloc", directory)
+    tracemalloc.take_snapshot().dump(path)
+    return path
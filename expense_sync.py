@@ -0,0 +1,375 @@
+"""Local sync service: desks share one ledger by replicating expense ops, not whole files.
+
+    python expense_sync.py serve --port 8765
+    python expense_cli.py sync http://127.0.0.1:8765
+
+Every expense a desk records becomes an append-only op with an ID of the form
+"<client>:<counter>". The server gives each op it accepts the next sequence number and
+keeps, per client, the highest counter it has seen (a version vector), so a batch
+that is retried after a lost reply is not applied twice. Desks push their outbox in
+batches and pull everything after the last sequence number they applied, so one that
+has been offline catches up from where it stopped. Request and reply bodies are
+deflate-compressed JSON.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import urllib.request
+import uuid
+import zlib
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import expense_core as core
+
+PORT = 8765
+LOG_FILE = "sync_ops.jsonl"
+BATCH = 500      # ops per request, both ways
+TIMEOUT = 10.0   # seconds per request
+INTERVAL = 5.0   # seconds between background syncs in the GUI
+
+def state_file_for(data_file):
+    return os.path.splitext(data_file)[0] + "_sync.json"
+
+def outbox_file_for(data_file):
+    return os.path.splitext(data_file)[0] + "_outbox.jsonl"
+
+def rejects_file_for(data_file):
+    return os.path.splitext(data_file)[0] + "_sync_rejects.jsonl"
+
+def read_jsonl(path):
+    """Records of a JSON-lines file. A torn last line is cut off the file, as the ledger's
+    journal replay does, so that lines appended next do not land on the fragment"""
+    records = []
+    if not os.path.exists(path):
+        return records
+    good_bytes = 0
+    with open(path, "rb+") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            good_bytes += len(line)
+        f.truncate(good_bytes)
+    return records
+
+def encode(payload):
+    return zlib.compress(json.dumps(payload).encode("utf-8"))
+
+def decode(body):
+    return json.loads(zlib.decompress(body))
+
+def normalize_expense(exp):
+    """The expense as the ledger stores it, or ValueError if it is not one.
+    Amounts must be real numbers: "10" or True would be accepted by the server but break every client"""
+    if not isinstance(exp, dict):
+        raise ValueError("expense must be an object")
+    amount, category, day = exp.get("amount"), exp.get("category"), exp.get("date")
+    if not isinstance(amount, (int, float)) or isinstance(amount, bool) or not math.isfinite(amount) or amount <= 0:
+        raise ValueError(f"invalid amount: {amount!r}")
+    if not isinstance(category, str) or not category:
+        raise ValueError(f"invalid category: {category!r}")
+    if not isinstance(day, str):
+        raise ValueError(f"invalid date: {day!r}")
+    return {"amount": float(amount), "category": category, "date": date.fromisoformat(day).isoformat()}
+
+# ---------------- SERVER ---------------- #
+class OpLog:
+    """The server's append-only op log, in memory and in a JSON-lines file"""
+    def __init__(self, path=LOG_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.ops = read_jsonl(path)  # op seq n is ops[n - 1]
+        self.clocks = {}             # client -> highest op counter accepted
+        for op in self.ops:
+            self.clocks[op["client"]] = max(self.clocks.get(op["client"], 0), op["counter"])
+        self.file = open(path, "a", encoding="utf-8")
+
+    def append(self, client, ops):
+        """Accept a client's ops in counter order; ones already seen are skipped. Returns the count accepted"""
+        accepted = []
+        with self.lock:
+            clock = self.clocks.get(client, 0)
+            for op in ops:
+                if op["counter"] <= clock:
+                    continue
+                clock = op["counter"]
+                accepted.append({
+                    "seq": len(self.ops) + len(accepted) + 1,
+                    "id": f"{client}:{op['counter']}",
+                    "client": client,
+                    "counter": op["counter"],
+                    "expense": op["expense"]
+                })
+            if accepted:
+                # One write and fsync per batch, before anyone can read the new ops
+                start = os.fstat(self.file.fileno()).st_size
+                try:
+                    self.file.write("".join(json.dumps(op) + "\n" for op in accepted))
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+                except Exception:
+                    # Nothing was accepted, so whatever part of the batch reached the file goes too
+                    self.reopen(start)
+                    raise
+                self.ops.extend(accepted)
+                self.clocks[client] = clock
+            return len(accepted), len(self.ops)
+
+    def reopen(self, size):
+        """Cut the log file back to size; the open file's unwritten buffer is discarded with it"""
+        try:
+            self.file.close()
+        except OSError:
+            pass
+        os.truncate(self.path, size)
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def since(self, seq, limit=BATCH):
+        with self.lock:
+            ops = self.ops[seq:seq + limit]
+            return ops, len(self.ops)
+
+    def close(self):
+        self.file.close()
+
+class SyncHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def reply(self, status, payload):
+        body = encode(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "deflate")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/ops":
+            try:
+                since = int(query.get("since", ["0"])[0])
+                limit = min(int(query.get("limit", [str(BATCH)])[0]), BATCH)
+            except ValueError:
+                return self.reply(400, {"error": "since and limit must be integers"})
+            ops, seq = self.server.log.since(max(0, since), max(1, limit))
+            return self.reply(200, {"ops": ops, "seq": seq})
+        if url.path == "/status":
+            with self.server.log.lock:
+                status = {"seq": len(self.server.log.ops), "clocks": dict(self.server.log.clocks)}
+            return self.reply(200, status)
+        self.reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/ops":
+            return self.reply(404, {"error": "not found"})
+        try:
+            payload = decode(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            client = payload["client"]
+            if not isinstance(client, str) or not client or not isinstance(payload["ops"], list):
+                raise ValueError("invalid client or ops")
+            ops = []
+            for op in payload["ops"]:
+                if not isinstance(op["counter"], int) or isinstance(op["counter"], bool):
+                    raise ValueError("invalid op counter")
+                ops.append({"counter": op["counter"], "expense": normalize_expense(op["expense"])})
+            ops.sort(key=lambda op: op["counter"])
+        except (KeyError, TypeError, ValueError, zlib.error):
+            return self.reply(400, {"error": "malformed batch"})
+        accepted, seq = self.server.log.append(client, ops)
+        self.reply(200, {"accepted": accepted, "seq": seq})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class SyncServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, log_file=LOG_FILE, verbose=False):
+        self.log = OpLog(log_file)
+        self.verbose = verbose
+        super().__init__(address, SyncHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.log.close()
+
+# ---------------- CLIENT ---------------- #
+class SyncClient:
+    """Replicates one ledger through a sync server.
+
+    attach() has every local expense journaled to an outbox file as an op, whether or
+    not the server is reachable. exchange() pushes the outbox and pulls new remote ops
+    and only does network I/O, so the GUI runs it on a worker thread; apply() then
+    adds the pulled ops to the ledger on the thread that owns it.
+    """
+    def __init__(self, ledger, url=None):
+        self.ledger = ledger
+        self.state_file = state_file_for(ledger.data_file)
+        self.outbox_file = outbox_file_for(ledger.data_file)
+        self.rejects_file = rejects_file_for(ledger.data_file)
+        self.rejected = 0  # pulled ops skipped because they could not be applied
+        self.lock = threading.Lock()
+        self.applying = False
+
+        state = {}
+        if os.path.exists(self.state_file):
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+        self.client = state.get("client") or uuid.uuid4().hex[:12]
+        self.url = (url or state.get("url") or "").rstrip("/")
+        self.acked = state.get("acked", 0)        # highest own counter the server has confirmed
+        self.last_seq = state.get("last_seq", 0)  # remote ops applied up to this sequence number
+        self.outbox = [op for op in read_jsonl(self.outbox_file) if op["counter"] > self.acked]
+        self.next_counter = max([self.acked] + [op["counter"] for op in self.outbox]) + 1
+
+    def save_state(self):
+        state = {"client": self.client, "url": self.url, "acked": self.acked, "last_seq": self.last_seq}
+        core.write_atomic(self.state_file, lambda f: json.dump(state, f))
+
+    def attach(self):
+        self.ledger.observers.append(self.record)
+        if not os.path.exists(self.state_file):
+            self.save_state()
+        return self
+
+    def record(self, expenses):
+        """Ledger observer: queue local expenses as ops; remote ones being applied are not echoed"""
+        if self.applying:
+            return
+        with self.lock:
+            ops = []
+            for exp in expenses:
+                ops.append({"counter": self.next_counter, "expense": exp})
+                self.next_counter += 1
+            with open(self.outbox_file, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(op) + "\n" for op in ops))
+            self.outbox.extend(ops)
+
+    def publish_existing(self):
+        """Queue every expense already in the ledger, archived months included; for the first desk only"""
+        for month in self.ledger.month_totals():
+            self.record(list(self.ledger.load_month(month).records()))
+
+    def request(self, method, path, payload=None):
+        data = encode(payload) if payload is not None else None
+        req = urllib.request.Request(self.url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json",
+                                              "Content-Encoding": "deflate"})
+        with urllib.request.urlopen(req, timeout=TIMEOUT) as response:
+            body = response.read()
+        try:
+            return decode(body)
+        except (ValueError, zlib.error) as e:
+            # Reported like any other network failure: nothing was applied, so it is safe to retry
+            raise OSError(f"Unreadable reply from {self.url}: {e}") from e
+
+    def exchange(self):
+        """Push the outbox, then pull what others added since last_seq; returns (ops, seq).
+        Raises OSError when the server cannot be reached; nothing is lost and the next call retries"""
+        if not self.url:
+            raise ValueError("No sync server configured")
+        while True:
+            with self.lock:
+                batch = self.outbox[:BATCH]
+            if not batch:
+                break
+            self.request("POST", "/ops", {"client": self.client, "ops": batch})
+            with self.lock:
+                self.acked = batch[-1]["counter"]
+                del self.outbox[:len(batch)]
+                # The acknowledgement is saved before the outbox is emptied, so counters are never reused
+                self.save_state()
+                if not self.outbox:
+                    core.write_atomic(self.outbox_file, lambda f: None)
+
+        pulled = []
+        seq = self.last_seq
+        while True:
+            reply = self.request("GET", f"/ops?since={seq}&limit={BATCH}")
+            # This desk's own ops are already in its ledger
+            pulled.extend(op for op in reply["ops"] if op["client"] != self.client)
+            seq += len(reply["ops"])
+            if not reply["ops"] or seq >= reply["seq"]:
+                break
+        return pulled, seq
+
+    def apply(self, ops, seq):
+        """Add pulled ops to the ledger and remember how far this desk has caught up.
+
+        An op that cannot be applied, for instance one a bad or older server accepted, is
+        skipped and written to the rejects file; raising instead would stop this desk at
+        that op for good, since every later round would pull it again."""
+        pairs, rejects = [], []
+        for op in ops:
+            try:
+                pairs.append((op, normalize_expense(op["expense"])))
+            except (KeyError, TypeError, ValueError) as e:
+                rejects.append((op, e))
+        applied = 0
+        if pairs:
+            self.applying = True
+            try:
+                try:
+                    self.ledger.add_expenses([exp for _, exp in pairs])
+                    applied = len(pairs)
+                except Exception:
+                    # The ledger checks a batch before adding any of it; retry one by one to find the culprits
+                    for op, exp in pairs:
+                        try:
+                            self.ledger.add_expenses([exp])
+                            applied += 1
+                        except Exception as e:
+                            rejects.append((op, e))
+            finally:
+                self.applying = False
+        if rejects:
+            with open(self.rejects_file, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps({"op": op, "error": str(e)}) + "\n" for op, e in rejects))
+            self.rejected += len(rejects)
+        self.last_seq = seq
+        self.save_state()
+        return applied
+
+    def sync(self):
+        """One full round trip; returns (pushed, pulled)"""
+        pending = len(self.outbox)
+        return pending, self.apply(*self.exchange())
+
+def attach(ledger):
+    """Start queueing a ledger's expenses if it has ever been synced; costs one stat call otherwise"""
+    if os.path.exists(state_file_for(ledger.data_file)):
+        return SyncClient(ledger).attach()
+    return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local sync server for shared expense ledgers")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the sync server")
+    serve.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    serve.add_argument("--port", type=int, default=PORT)
+    serve.add_argument("--log", default=LOG_FILE, help="op log file")
+    serve.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    server = SyncServer((args.host, args.port), args.log, args.verbose)
+    print(f"Serving {len(server.log.ops)} ops on http://{args.host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Spending trend series: calendar bucketing and LTTB downsampling for long histories"""
+from datetime import date, timedelta
+
+MAX_POINTS = 1000
+
+# Widest visible span, in days, that each bucket size is used for
+BUCKET_SPANS = (
+    (120, "day"),
+    (730, "week"),
+)
+
+def pick_bucket(first, last):
+    span = (last - first).days
+    for max_days, bucket in BUCKET_SPANS:
+        if span <= max_days:
+            return bucket
+    return "month"
+
+def bucket_start(day, bucket):
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+def bucket_totals(date_totals, bucket, start=None, end=None):
+    """Sum per-date totals into day/week/month buckets; returns sorted (date, total) pairs"""
+    buckets = {}
+    for key, total in date_totals.items():
+        day = date.fromisoformat(key)
+        if (start and day < start) or (end and day > end):
+            continue
+        first = bucket_start(day, bucket)
+        buckets[first] = buckets.get(first, 0) + total
+    return sorted(buckets.items())
+
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of (x, y) pairs with numeric x"""
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (len(points) - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(points))
+        next_points = points[next_start:next_end]
+        avg_x = sum(p[0] for p in next_points) / len(next_points)
+        avg_y = sum(p[1] for p in next_points) / len(next_points)
+
+        ax, ay = points[a]
+        best_area = -1
+        best = None
+        for j in range(int(i * every) + 1, next_start):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+def trend_series(date_totals, start=None, end=None, max_points=MAX_POINTS):
+    """Bucketed, bounded trend for the given range; returns (bucket, dates, totals)"""
+    if not date_totals:
+        return "day", [], []
+
+    if start is None or end is None:
+        days = sorted(date_totals)
+        start = start or date.fromisoformat(days[0])
+        end = end or date.fromisoformat(days[-1])
+    bucket = pick_bucket(start, end)
+
+    series = bucket_totals(date_totals, bucket, start, end)
+    if len(series) > max_points:
+        points = lttb([(day.toordinal(), total) for day, total in series], max_points)
+        series = [(date.fromordinal(x), total) for x, total in points]
+    return bucket, [day for day, _ in series], [total for _, total in series]
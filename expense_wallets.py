@@ -0,0 +1,87 @@
+"""Wallets: many independent ledgers in one directory, opened lazily and kept in an LRU cache"""
+import os
+import re
+from collections import OrderedDict
+
+import expense_core as core
+import expense_sync
+
+WALLETS_DIR = "wallets"
+CACHE_SIZE = 8
+DEFAULT_WALLET = "default"
+EXTENSIONS = (".bin", ".db")
+JOURNAL_SUFFIX = "_journal.jsonl"  # a wallet that has not been compacted yet has only its journal
+
+NAME_PATTERN = re.compile(r"^\w[\w .-]*$")
+
+class WalletManager:
+    """Each wallet is its own ledger file (with its own journal and archive) in `directory`.
+
+    At most `cache_size` ledgers are open at a time; opening another one closes the
+    least recently used, which flushes its pending writes first.
+    """
+    def __init__(self, directory=WALLETS_DIR, cache_size=CACHE_SIZE, background=False):
+        self.directory = directory
+        self.cache_size = max(1, cache_size)
+        self.background = background
+        self.open_ledgers = OrderedDict()  # name -> ledger, least recently used first
+        os.makedirs(directory, exist_ok=True)
+
+    def names(self):
+        """Wallet names on disk, plus any opened but not yet saved"""
+        found = set(self.open_ledgers)
+        for entry in os.listdir(self.directory):
+            name, extension = os.path.splitext(entry)
+            if extension in EXTENSIONS:
+                found.add(name)
+            elif entry.endswith(JOURNAL_SUFFIX):
+                found.add(entry[:-len(JOURNAL_SUFFIX)])
+        return sorted(found)
+
+    def path_for(self, name, extension=".bin"):
+        if not NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid wallet name: {name!r}")
+        for existing in EXTENSIONS:
+            path = os.path.join(self.directory, name + existing)
+            if os.path.exists(path):
+                return path
+        return os.path.join(self.directory, name + extension)
+
+    def open(self, name):
+        """The wallet's ledger, loading it on first use; a cache hit costs O(1)"""
+        ledger = self.open_ledgers.get(name)
+        if ledger is not None:
+            self.open_ledgers.move_to_end(name)
+            return ledger
+
+        return self.keep_open(name, core.open_ledger(self.path_for(name), self.background))
+
+    def keep_open(self, name, ledger):
+        # A wallet that has been synced keeps queueing its new expenses
+        expense_sync.attach(ledger)
+        self.open_ledgers[name] = ledger
+        while len(self.open_ledgers) > self.cache_size:
+            _, evicted = self.open_ledgers.popitem(last=False)
+            evicted.close()
+        return ledger
+
+    def create(self, name, sqlite=False):
+        """Start a new, empty wallet and return its ledger"""
+        if name in self.names():
+            raise ValueError(f"Wallet {name!r} already exists")
+        path = self.path_for(name, ".db" if sqlite else ".bin")
+        ledger = core.open_ledger(path, self.background)
+        ledger.save_data()
+        return self.keep_open(name, ledger)
+
+    def close(self):
+        """Close every open wallet, even when one fails; the first error is raised afterwards"""
+        error = None
+        while self.open_ledgers:
+            _, ledger = self.open_ledgers.popitem(last=False)
+            try:
+                ledger.close()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
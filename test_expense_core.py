@@ -0,0 +1,79 @@
+"""Regression tests for the file ledger's journal writes"""
+import errno
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import expense_core as core
+
+real_fsync = os.fsync
+
+class JournalRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.dir.name, "ledger.bin")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def add_failing(self, ledger, amount, fail):
+        """Add an expense while the journal's fsync fails once, as fail(fd) decides"""
+        calls = []
+
+        def fsync(fd):
+            if not calls:
+                calls.append(fd)
+                fail(fd)
+            real_fsync(fd)
+
+        with mock.patch.object(core.os, "fsync", fsync):
+            with self.assertRaises(OSError):
+                ledger.add_expense(amount, "Food")
+        # The write that failed is still queued; the retry writes it
+        ledger.persister.write_pending()
+        self.assertIsInstance(ledger.pop_write_error(), OSError)
+
+    def reload_total(self, ledger):
+        ledger.close()
+        return core.Ledger(self.data_file).get_total()
+
+    def test_failed_fsync_is_not_journaled_twice(self):
+        ledger = core.Ledger(self.data_file)
+        ledger.add_expense(1, "Food")
+
+        def fail(fd):
+            raise OSError(errno.EIO, "fsync failed")
+
+        self.add_failing(ledger, 50, fail)
+        self.assertEqual(self.reload_total(ledger), 51.0)
+
+    def test_partial_append_does_not_hide_later_records(self):
+        ledger = core.Ledger(self.data_file)
+        ledger.add_expense(1, "Food")
+
+        def fail(fd):
+            os.write(fd, b'{"gen": 1, "exp')
+            raise OSError(errno.ENOSPC, "No space left on device")
+
+        self.add_failing(ledger, 50, fail)
+        ledger.add_expense(7, "Bills")
+        self.assertEqual(self.reload_total(ledger), 58.0)
+
+class AddExpensesTest(unittest.TestCase):
+    def test_bad_batch_adds_nothing(self):
+        with tempfile.TemporaryDirectory() as directory:
+            data_file = os.path.join(directory, "ledger.bin")
+            ledger = core.Ledger(data_file)
+            today = core.today_str()
+            for bad in ({"amount": 2, "category": "Food", "date": "2026-13-01"},
+                        {"amount": 2, "category": "food", "date": today}):
+                with self.assertRaises(ValueError):
+                    ledger.add_expenses([{"amount": 1, "category": "Food", "date": today}, bad])
+            self.assertEqual(len(ledger.store.days), len(ledger.store.amounts))
+            self.assertEqual(ledger.get_total(), 0)
+            ledger.close()
+            self.assertEqual(core.Ledger(data_file).get_total(), 0)
+
+if __name__ == "__main__":
+    unittest.main()